@@ -5,6 +5,8 @@ from datetime import datetime
 
 from app.config import settings
 from app.models import MetadataStatus
+from app.resilience import CircuitOpenError, circuit_breaker, negative_cache, get_host
+from app.timing import FetchTimer, fetch_stats
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +18,8 @@ class MetadataCollector:
     async def collect_metadata(url: str) -> Tuple[Dict, MetadataStatus]:
         # Gather headers, cookies, and HTML content from the provided URL.
         # Handles network, HTTP, SSL, and invalid URL errors.
+        # Fetches to hosts with an open circuit breaker raise CircuitOpenError without a network call,
+        # nothing was learned about the URL so callers must not store a record for it.
 
         metadata = {
             "url": url, 
@@ -28,13 +32,24 @@ class MetadataCollector:
             "error_message": None
         }
         
+        host = get_host(url)
+        if not circuit_breaker.allow(host):
+            # Back off for the failure that opened the breaker, so the backoff keeps growing
+            error = CircuitOpenError(host, circuit_breaker.error_type(host))
+            negative_cache.record_failure(url, error.error_type)
+            logger.warning("Skipping fetch of %s: %s", url, error, extra={"url": url})
+            raise error
+        
+        timer = FetchTimer()
+        
         try:
             async with httpx.AsyncClient(
                 timeout=settings.request_timeout,
                 follow_redirects=True,
-                verify=True  # SSL verification
+                verify=True,  # SSL verification
+                event_hooks=timer.event_hooks
             ) as client:
-                response = await client.get(url)
+                response = await client.get(url, extensions=timer.extensions)
                 
                 # Raise exception for HTTP error responses
                 response.raise_for_status()
@@ -46,12 +61,22 @@ class MetadataCollector:
                 metadata["status"] = MetadataStatus.COMPLETED
                 metadata.pop("error_message", None)  # Remove error message if successful
                 
-                logger.info(f"Successfully collected metadata for {url}")
+                circuit_breaker.record_success(host)
+                negative_cache.record_success(url)
+                logger.info("Successfully collected metadata for %s", url, extra={"url": url})
             
         except Exception as e:
-            error_msg = f"Unexpected error: {type(e).__name__}"
-            logger.error(f"{error_msg} collecting metadata for {url}: {e}")
+            error_type = type(e).__name__
+            error_msg = f"Unexpected error: {error_type}"
+            logger.error("%s collecting metadata for %s: %s", error_msg, url, e, extra={"url": url})
             metadata["status"] = MetadataStatus.FAILED
             metadata["error_message"] = error_msg
+            
+            circuit_breaker.record_failure(host, error_type)
+            negative_cache.record_failure(url, error_type)
+        
+        # Per-phase timings are kept on the record and fed to the aggregate stats
+        metadata["timing"] = timer.breakdown()
+        fetch_stats.record(metadata["timing"], failed=metadata["status"] == MetadataStatus.FAILED)
         
         return metadata, metadata["status"]
\ No newline at end of file
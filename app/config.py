@@ -1,5 +1,10 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
-from pydantic import field_validator
+from pydantic import field_validator, ValidationInfo
+
+
+READ_PREFERENCES = ("primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest")
 
 
 class Settings(BaseSettings):
@@ -10,6 +15,87 @@ class Settings(BaseSettings):
     collection_name: str = "url_metadata"
     request_timeout: int = 10
     
+    # MongoDB connection retries (jittered exponential backoff, seconds)
+    db_connect_retries: int = 5
+    db_retry_base_delay: float = 0.1
+    db_retry_max_delay: float = 5.0
+    db_server_selection_timeout_ms: int = 5000
+    readiness_check_timeout: float = 2.0
+    
+    # Read/write routing: hot GET reads use their own client and read preference,
+    # pending placeholders are written with a cheaper write concern than collected results
+    read_preference: str = "primary"
+    read_max_staleness_seconds: Optional[int] = None
+    read_pool_size: int = 50
+    write_pool_size: int = 50
+    min_pool_size: int = 10
+    result_write_concern: str = "majority"
+    pending_write_concern: str = "1"
+    
+    # Page sources larger than this (UTF-8 bytes) are stored in GridFS instead of the document.
+    # A document can keep the page source, its gzip and br forms and two encoded responses inline,
+    # each up to this size, so it is capped at 2 MB to stay well under MongoDB's 16 MB document limit.
+    gridfs_threshold_bytes: int = 1048576
+    gridfs_bucket_name: str = "page_sources"
+    source_chunk_size: int = 262144
+    # Replaced GridFS page sources are kept this long (seconds) for streams still reading them
+    gridfs_retire_grace: int = 600
+    gridfs_purge_interval: int = 60
+    
+    # Precompressed page sources and responses, stored at ingest and sent as-is to clients
+    compression_min_bytes: int = 512
+    gzip_level: int = 6
+    brotli_quality: int = 5
+    
+    # Cache of serialized responses shared by uvicorn worker processes through a memory-mapped file
+    shared_cache_enabled: bool = False
+    shared_cache_path: str = "/dev/shm/metadata-cache"
+    shared_cache_slots: int = 1024
+    shared_cache_slot_size: int = 65536
+    shared_cache_ttl: int = 300
+    
+    # Negative caching of FAILED fetches (seconds)
+    negative_cache_base_ttl: int = 30
+    negative_cache_max_ttl: int = 3600
+    negative_cache_max_entries: int = 100000
+    
+    # Upper bound for the GET /metadata long-poll `wait` parameter (seconds)
+    long_poll_max_wait: int = 30
+    
+    # Pending records older than request_timeout plus this margin (seconds) are collected again
+    pending_abandon_margin: int = 30
+    
+    # Per-host circuit breaker
+    breaker_failure_threshold: int = 5
+    breaker_reset_timeout: int = 60
+    breaker_max_hosts: int = 10000
+    
+    # Logging goes through a bounded queue drained by a background thread.
+    # Repetitive per-URL messages are limited to `log_rate_limit_burst` per window (seconds),
+    # warnings and errors to the larger `log_rate_limit_warning_burst`.
+    log_level: str = "INFO"
+    log_format: str = "json"
+    log_queue_size: int = 10000
+    log_rate_limit_burst: int = 10
+    log_rate_limit_warning_burst: int = 1000
+    log_rate_limit_window: float = 60.0
+    
+    # Access counting (flushed in batches, seconds) and cache warm-up from the hottest records or a seed file.
+    # Records older than `warmup_max_age` seconds are re-collected; with a non-zero threshold, /ready waits
+    # for that fraction of the startup warm-up to be processed.
+    access_flush_interval: float = 5.0
+    warmup_on_startup: bool = False
+    warmup_seed_file: Optional[str] = None
+    warmup_limit: int = 1000
+    warmup_concurrency: int = 10
+    warmup_max_age: int = 86400
+    warmup_ready_threshold: float = 0.0
+    
+    # Fetch timing stats and the opt-in sampling profiler
+    fetch_stats_window: int = 1000
+    profiling_sample_interval: float = 0.005
+    profiling_max_profiles: int = 20
+    
     @field_validator('request_timeout')
     @classmethod
     def validate_timeout(cls, v):
@@ -17,6 +103,105 @@ class Settings(BaseSettings):
             raise ValueError('request_timeout must be between 1 and 60 seconds')
         return v
     
+    @field_validator('negative_cache_base_ttl', 'negative_cache_max_ttl', 'breaker_failure_threshold', 'breaker_reset_timeout', 'long_poll_max_wait',
+                     'negative_cache_max_entries', 'breaker_max_hosts', 'pending_abandon_margin',
+                     'db_connect_retries', 'db_server_selection_timeout_ms', 'fetch_stats_window', 'profiling_max_profiles',
+                     'source_chunk_size', 'gridfs_retire_grace', 'gridfs_purge_interval',
+                     'shared_cache_slots', 'shared_cache_slot_size', 'shared_cache_ttl',
+                     'read_pool_size', 'write_pool_size', 'log_queue_size', 'log_rate_limit_burst',
+                     'log_rate_limit_warning_burst',
+                     'warmup_limit', 'warmup_concurrency', 'warmup_max_age')
+    @classmethod
+    def validate_positive(cls, v):
+        if v < 1:
+            raise ValueError('value must be at least 1')
+        return v
+    
+    @field_validator('db_retry_base_delay', 'db_retry_max_delay', 'readiness_check_timeout', 'profiling_sample_interval',
+                     'log_rate_limit_window', 'access_flush_interval')
+    @classmethod
+    def validate_delay(cls, v):
+        if v <= 0:
+            raise ValueError('value must be greater than 0')
+        return v
+    
+    @field_validator('gridfs_threshold_bytes')
+    @classmethod
+    def validate_gridfs_threshold(cls, v):
+        if v < 1 or v > 2097152:
+            raise ValueError('gridfs_threshold_bytes must be between 1 and 2097152 (2 MB)')
+        return v
+    
+    @field_validator('gzip_level')
+    @classmethod
+    def validate_gzip_level(cls, v):
+        if v < 1 or v > 9:
+            raise ValueError('gzip_level must be between 1 and 9')
+        return v
+    
+    @field_validator('brotli_quality')
+    @classmethod
+    def validate_brotli_quality(cls, v):
+        if v < 0 or v > 11:
+            raise ValueError('brotli_quality must be between 0 and 11')
+        return v
+    
+    @field_validator('min_pool_size')
+    @classmethod
+    def validate_min_pool_size(cls, v):
+        if v < 0:
+            raise ValueError('min_pool_size must not be negative')
+        return v
+    
+    @field_validator('read_preference')
+    @classmethod
+    def validate_read_preference(cls, v):
+        if v not in READ_PREFERENCES:
+            raise ValueError(f"read_preference must be one of {', '.join(READ_PREFERENCES)}")
+        return v
+    
+    @field_validator('read_max_staleness_seconds')
+    @classmethod
+    def validate_max_staleness(cls, v, info: ValidationInfo):
+        # MongoDB only accepts a max staleness of at least 90 seconds, and not for primary reads
+        if v is None:
+            return v
+        if v < 90:
+            raise ValueError('read_max_staleness_seconds must be at least 90')
+        if info.data.get('read_preference') == 'primary':
+            raise ValueError('read_max_staleness_seconds cannot be used with the primary read preference')
+        return v
+    
+    @field_validator('result_write_concern', 'pending_write_concern')
+    @classmethod
+    def validate_write_concern(cls, v):
+        # A number of nodes, "majority" or a replica set tag
+        if not v or (v.isdigit() and int(v) < 1):
+            raise ValueError('write concern must be "majority", a tag or a number of at least 1')
+        return v
+    
+    @field_validator('warmup_ready_threshold')
+    @classmethod
+    def validate_ready_threshold(cls, v):
+        if v < 0 or v > 1:
+            raise ValueError('warmup_ready_threshold must be between 0 and 1')
+        return v
+    
+    @field_validator('log_format')
+    @classmethod
+    def validate_log_format(cls, v):
+        if v not in ('json', 'text'):
+            raise ValueError('log_format must be json or text')
+        return v
+    
+    @field_validator('log_level')
+    @classmethod
+    def validate_log_level(cls, v):
+        v = v.upper()
+        if v not in ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'):
+            raise ValueError('log_level must be DEBUG, INFO, WARNING, ERROR or CRITICAL')
+        return v
+    
     @field_validator('mongodb_url')
     @classmethod
     def validate_mongodb_url(cls, v):
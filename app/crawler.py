@@ -0,0 +1,303 @@
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import time
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Set, TextIO
+from urllib.parse import urlsplit
+
+from app.collector import MetadataCollector
+from app.config import settings
+from app.database import db
+from app.models import MetadataStatus
+from app.resilience import CircuitOpenError
+from app.repository import MetadataRepository
+from app.shared_cache import shared_cache
+
+logger = logging.getLogger(__name__)
+
+# Bulk crawler that feeds the inventory directly, bypassing the HTTP API.
+#
+# URLs are read from a file or stdin (plain lines, or NDJSON objects with a "url" key),
+# sharded by host across worker processes, and collected by each worker on its own
+# asyncio loop with batched bulk writes into the metadata collection.
+#
+#   python -m app.crawler urls.txt --workers 8 --concurrency 50
+#   cat urls.ndjson | python -m app.crawler - --checkpoint-dir .crawl
+#
+# The successfully fetched URLs of every flushed batch are appended to a per-worker checkpoint
+# file. URLs found in the checkpoint directory are skipped, so an interrupted crawl can simply
+# be restarted, and URLs that failed (timeouts, network errors) are retried by the next run.
+
+
+def parse_line(line: str) -> Optional[str]:
+    # Extract the URL from an input line, None for blank lines, comments and non-HTTP URLs
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+
+    if line.startswith("{") or line.startswith('"'):
+        try:
+            value = json.loads(line)
+        except ValueError:
+            return None
+        url = value.get("url") if isinstance(value, dict) else value
+        if not isinstance(url, str):
+            return None
+        line = url.strip()
+
+    if urlsplit(line).scheme not in ("http", "https"):
+        return None
+    return line
+
+
+def read_urls(source: TextIO) -> Iterator[str]:
+    # Yield unique URLs from the input, in order
+    seen: Set[str] = set()
+    for line in source:
+        url = parse_line(line)
+        if url and url not in seen:
+            seen.add(url)
+            yield url
+
+
+def shard_for(url: str, workers: int) -> int:
+    # Stable host-based shard, so every host (and its circuit breaker) lives in one worker
+    return zlib.crc32(urlsplit(url).netloc.lower().encode("utf-8")) % workers
+
+
+def checkpoint_path(checkpoint_dir: str, worker: int) -> str:
+    return os.path.join(checkpoint_dir, f"worker-{worker}.done")
+
+
+def load_checkpoint(checkpoint_dir: Optional[str]) -> Set[str]:
+    # URLs already stored by previous runs
+    done: Set[str] = set()
+    if not checkpoint_dir:
+        return done
+    for path in glob.glob(os.path.join(checkpoint_dir, "worker-*.done")):
+        with open(path, encoding="utf-8") as checkpoint:
+            done.update(line.strip() for line in checkpoint if line.strip())
+    return done
+
+
+async def crawl_shard(
+    worker: int,
+    urls: List[str],
+    concurrency: int,
+    batch_size: int,
+    checkpoint_file: Optional[TextIO] = None,
+    progress: Optional[multiprocessing.Queue] = None
+) -> Dict[str, int]:
+    # Collect one shard of URLs with `concurrency` fetches in flight and batched writes
+    pending: asyncio.Queue = asyncio.Queue()
+    for url in urls:
+        pending.put_nowait(url)
+
+    batch: List[Dict] = []
+    totals = {"done": 0, "failed": 0, "write_errors": 0, "skipped": 0}
+    flush_lock = asyncio.Lock()
+
+    async def flush():
+        async with flush_lock:
+            if not batch:
+                return
+            records = batch[:]
+            batch.clear()
+
+            failed = sum(1 for record in records if record["status"] == MetadataStatus.FAILED)
+            if await MetadataRepository.bulk_create_or_update(records):
+                totals["done"] += len(records)
+                totals["failed"] += failed
+                if checkpoint_file is not None:
+                    # Failed fetches are stored but not checkpointed, so a resumed crawl retries them
+                    checkpoint_file.write("".join(
+                        f"{record['url']}\n" for record in records if record["status"] != MetadataStatus.FAILED
+                    ))
+                    checkpoint_file.flush()
+                    os.fsync(checkpoint_file.fileno())
+                update = (worker, len(records), failed, 0)
+            else:
+                totals["write_errors"] += len(records)
+                update = (worker, 0, 0, len(records))
+
+            if progress is not None:
+                progress.put(update)
+
+    async def fetch_worker():
+        while True:
+            try:
+                url = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                metadata, _ = await MetadataCollector.collect_metadata(url)
+            except CircuitOpenError:
+                # Not fetched, so the stored record is kept and the URL is left out of the checkpoint
+                totals["skipped"] += 1
+                continue
+            batch.append(metadata)
+            if len(batch) >= batch_size:
+                await flush()
+
+    await asyncio.gather(*(fetch_worker() for _ in range(min(concurrency, len(urls)) or 1)))
+    await flush()
+    if totals["skipped"]:
+        logger.warning("Skipped %d URLs of hosts with an open circuit breaker, rerun to retry them", totals["skipped"])
+    return totals
+
+
+def run_worker(
+    worker: int,
+    urls: List[str],
+    concurrency: int,
+    batch_size: int,
+    checkpoint_dir: Optional[str],
+    progress: multiprocessing.Queue
+):
+    # Entry point of a worker process
+    logging.basicConfig(
+        level=logging.WARNING,
+        format=f'%(asctime)s - worker-{worker} - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    async def main():
+        # Writes must invalidate the API workers' shared cache entries of the refreshed URLs
+        if settings.shared_cache_enabled:
+            shared_cache.open()
+        await db.connect()
+        checkpoint_file = None
+        if checkpoint_dir:
+            checkpoint_file = open(checkpoint_path(checkpoint_dir, worker), "a", encoding="utf-8")
+        try:
+            await crawl_shard(worker, urls, concurrency, batch_size, checkpoint_file, progress)
+        finally:
+            if checkpoint_file is not None:
+                checkpoint_file.close()
+            await db.disconnect()
+            shared_cache.close()
+
+    asyncio.run(main())
+
+
+def report(total: int, done: int, failed: int, write_errors: int, started: float, out: TextIO):
+    # Print a one-line throughput and error-rate summary
+    elapsed = max(time.monotonic() - started, 1e-9)
+    error_rate = (failed / done * 100) if done else 0.0
+    out.write(
+        f"{done}/{total} stored ({done / elapsed:.1f} urls/s), "
+        f"{failed} failed ({error_rate:.1f}%), {write_errors} write errors, {elapsed:.0f}s elapsed\n"
+    )
+    out.flush()
+
+
+def crawl(
+    urls: Iterable[str],
+    workers: int,
+    concurrency: int,
+    batch_size: int,
+    checkpoint_dir: Optional[str],
+    report_interval: float,
+    out: TextIO = sys.stderr
+) -> int:
+    # Shard the URLs by host, run one process per shard and report progress until all are done
+    done_urls = load_checkpoint(checkpoint_dir)
+    shards: List[List[str]] = [[] for _ in range(workers)]
+    skipped = 0
+    for url in urls:
+        if url in done_urls:
+            skipped += 1
+            continue
+        shards[shard_for(url, workers)].append(url)
+
+    total = sum(len(shard) for shard in shards)
+    if skipped:
+        out.write(f"Skipping {skipped} URLs already in the checkpoint\n")
+    if not total:
+        out.write("Nothing to crawl\n")
+        return 0
+
+    if checkpoint_dir:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    # Spawn, so every worker starts with a clean event loop and MongoDB client
+    context = multiprocessing.get_context("spawn")
+    progress = context.Queue()
+    processes = [
+        context.Process(
+            target=run_worker,
+            args=(worker, shard, concurrency, batch_size, checkpoint_dir, progress),
+            name=f"crawler-worker-{worker}"
+        )
+        for worker, shard in enumerate(shards) if shard
+    ]
+    for process in processes:
+        process.start()
+
+    started = time.monotonic()
+    last_report = started
+    done = failed = write_errors = 0
+
+    def drain(timeout: float):
+        nonlocal done, failed, write_errors
+        try:
+            _, stored, batch_failed, batch_write_errors = progress.get(timeout=timeout)
+        except queue.Empty:
+            return
+        done += stored
+        failed += batch_failed
+        write_errors += batch_write_errors
+
+    while any(process.is_alive() for process in processes):
+        drain(timeout=0.2)
+        if time.monotonic() - last_report >= report_interval:
+            report(total, done, failed, write_errors, started, out)
+            last_report = time.monotonic()
+
+    for process in processes:
+        process.join()
+    while not progress.empty():
+        drain(timeout=0)
+
+    report(total, done, failed, write_errors, started, out)
+
+    crashed = [process.name for process in processes if process.exitcode != 0]
+    if crashed:
+        out.write(f"Workers exited with errors: {', '.join(crashed)}\n")
+    return 1 if crashed or write_errors else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.crawler",
+        description="Bulk-collect metadata for a list of URLs straight into the inventory"
+    )
+    parser.add_argument("input", help="File with one URL or NDJSON object per line, '-' for stdin")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count)")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent fetches per worker")
+    parser.add_argument("--batch-size", type=int, default=100, help="Records per bulk write")
+    parser.add_argument("--checkpoint-dir", default=None, help="Directory for resumable checkpoints")
+    parser.add_argument("--report-interval", type=float, default=5.0, help="Seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    for name in ("workers", "concurrency", "batch_size"):
+        if getattr(args, name) < 1:
+            parser.error(f"--{name.replace('_', '-')} must be at least 1")
+
+    if args.input == "-":
+        urls = list(read_urls(sys.stdin))
+    else:
+        with open(args.input, encoding="utf-8") as source:
+            urls = list(read_urls(source))
+
+    return crawl(urls, args.workers, args.concurrency, args.batch_size, args.checkpoint_dir, args.report_interval)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
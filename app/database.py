@@ -1,70 +1,204 @@
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
-from typing import Optional
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase, AsyncIOMotorGridFSBucket
+from pymongo import WriteConcern
+from typing import Optional, Union
+from enum import Enum
 import logging
 import asyncio
+import random
 
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
 
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    # Exponential backoff with full jitter: a random delay in [0, min(max, base * 2^attempt)]
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def parse_write_concern(value: str) -> Union[int, str]:
+    # "2" -> 2, "majority" and replica set tags are passed through
+    return int(value) if value.isdigit() else value
+
+
+class Route(str, Enum):
+    # Which client and options an operation goes through
+    PRIMARY = "primary"    # Collected results, and reads that must see the latest write
+    PENDING = "pending"    # Pending placeholders, written with the cheaper pending write concern
+    HOT_READ = "hot_read"  # Hot GET reads, may be served by secondaries
+
+
 class Database:
-    # Manages MongoDB connections with retry support
-    
+    # Manages MongoDB connections with retry support.
+    # Writes and hot reads use separate clients, so each route has its own connection pool
+    # and a burst of reads can't starve the writes of connections (or the other way around).
+
     client: Optional[AsyncIOMotorClient] = None
+    read_client: Optional[AsyncIOMotorClient] = None
     db: Optional[AsyncIOMotorDatabase] = None
-    
+    read_db: Optional[AsyncIOMotorDatabase] = None
+    connected: bool = False
+    indexes_ready: bool = False
+    _startup_task: Optional[asyncio.Task] = None
+    _index_task: Optional[asyncio.Task] = None
+
     @classmethod
-    async def connect(cls, max_retries: int = 5, retry_delay: int = 2):
-       # Connect to MongoDB with multiple retry attempts
-        for attempt in range(max_retries):
+    async def connect(cls, max_retries: Optional[int] = None, retry_forever: bool = False):
+        # Connect to MongoDB, retrying with jittered exponential backoff.
+        # Index creation is started in the background so callers are not held up by it.
+        if max_retries is None:
+            max_retries = settings.db_connect_retries
+
+        # The clients connect lazily and reconnect by themselves, so one set is enough for all attempts
+        cls.create_clients()
+
+        attempt = 0
+        while True:
             try:
-                cls.client = AsyncIOMotorClient(
-                    settings.mongodb_url,
-                    serverSelectionTimeoutMS=5000,
-                    maxPoolSize=50,  # Connection pool size
-                    minPoolSize=10,
-                    maxIdleTimeMS=30000
-                )
-                cls.db = cls.client[settings.database_name]
-                
                 # Test connection
                 await cls.client.admin.command('ping')
+                cls.connected = True
                 logger.info("Successfully connected to MongoDB")
-                
-                # Ensuring a unique index exists on the url field
-                await cls.db[settings.collection_name].create_index(
-                    "url", 
-                    unique=True
-                )
-                logger.info("Created index on 'url' field")
-                
+
+                if not cls.indexes_ready and (cls._index_task is None or cls._index_task.done()):
+                    cls._index_task = asyncio.create_task(cls.ensure_indexes())
+
                 return
-                
+
             except Exception as e:
+                attempt += 1
                 logger.warning(
-                    f"MongoDB connection attempt {attempt + 1}/{max_retries} failed: {e}"
+                    "MongoDB connection attempt %s failed: %s",
+                    attempt if retry_forever else f"{attempt}/{max_retries}", e
                 )
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay)
-                else:
+                if not retry_forever and attempt >= max_retries:
                     logger.error("Failed to connect to MongoDB after all retries")
                     raise
-    
+                await asyncio.sleep(
+                    backoff_delay(attempt - 1, settings.db_retry_base_delay, settings.db_retry_max_delay)
+                )
+
+    @classmethod
+    def create_clients(cls):
+        # Create the write (primary) and hot read clients, each with its own pool
+        cls.client = AsyncIOMotorClient(
+            settings.mongodb_url,
+            serverSelectionTimeoutMS=settings.db_server_selection_timeout_ms,
+            maxPoolSize=settings.write_pool_size,
+            minPoolSize=min(settings.min_pool_size, settings.write_pool_size),
+            maxIdleTimeMS=30000,
+            w=parse_write_concern(settings.result_write_concern)
+        )
+        cls.db = cls.client[settings.database_name]
+
+        read_options = {}
+        if settings.read_max_staleness_seconds is not None:
+            read_options["maxStalenessSeconds"] = settings.read_max_staleness_seconds
+        cls.read_client = AsyncIOMotorClient(
+            settings.mongodb_url,
+            serverSelectionTimeoutMS=settings.db_server_selection_timeout_ms,
+            maxPoolSize=settings.read_pool_size,
+            minPoolSize=min(settings.min_pool_size, settings.read_pool_size),
+            maxIdleTimeMS=30000,
+            readPreference=settings.read_preference,
+            **read_options
+        )
+        cls.read_db = cls.read_client[settings.database_name]
+
+    @classmethod
+    def start(cls):
+        # Connect in the background so the application can start serving (liveness) immediately.
+        # Readiness is reported through is_ready() once the connection and indexes are up.
+        cls._startup_task = asyncio.create_task(cls.connect(retry_forever=True))
+
+    @classmethod
+    async def ensure_indexes(cls):
+        # Ensuring the unique url index and the access_count and retired file indexes exist, retried until it succeeds
+        attempt = 0
+        while not cls.indexes_ready:
+            try:
+                await cls.db[settings.collection_name].create_index(
+                    "url",
+                    unique=True
+                )
+                # Ranking the hottest records for cache warm-up
+                await cls.db[settings.collection_name].create_index([("access_count", -1)])
+                # Finding replaced GridFS page sources to purge
+                await cls.get_gridfs_files().create_index("metadata.retired_at", sparse=True)
+                cls.indexes_ready = True
+                logger.info("Created indexes on 'url', 'access_count' and retired page source files")
+            except Exception as e:
+                logger.error("Failed to create indexes: %s", e)
+                await asyncio.sleep(
+                    backoff_delay(attempt, settings.db_retry_base_delay, settings.db_retry_max_delay)
+                )
+                attempt += 1
+
+    @classmethod
+    async def wait_connected(cls):
+        # Wait for the background connection started by start()
+        if cls._startup_task is not None:
+            await asyncio.shield(cls._startup_task)
+
+    @classmethod
+    def is_ready(cls) -> bool:
+        # Connected and indexes built
+        return cls.connected and cls.indexes_ready
+
     @classmethod
     async def disconnect(cls):
         # Close the MongoDB client connection
+        for task in (cls._startup_task, cls._index_task):
+            if task is not None and not task.done():
+                task.cancel()
+        cls._startup_task = None
+        cls._index_task = None
+
+        if cls.read_client:
+            cls.read_client.close()
         if cls.client:
             cls.client.close()
             logger.info("Disconnected from MongoDB")
-    
+        cls.client = None
+        cls.read_client = None
+        cls.db = None
+        cls.read_db = None
+        cls.connected = False
+        cls.indexes_ready = False
+
+    @classmethod
+    def get_collection(cls, route: Route = Route.PRIMARY):
+        # Retrieve the metadata collection object for an operation route
+        if cls.db is None:
+            raise RuntimeError("Database not connected")
+        if route == Route.HOT_READ:
+            return cls.read_db[settings.collection_name]
+        collection = cls.db[settings.collection_name]
+        if route == Route.PENDING:
+            return collection.with_options(
+                write_concern=WriteConcern(w=parse_write_concern(settings.pending_write_concern))
+            )
+        return collection
+
+    @classmethod
+    def reads_from_secondaries(cls) -> bool:
+        # Hot reads may return data that lags behind the primary
+        return settings.read_preference != "primary"
+
+    @classmethod
+    def get_gridfs_bucket(cls) -> AsyncIOMotorGridFSBucket:
+        # Retrieve the GridFS bucket holding large page sources
+        if cls.db is None:
+            raise RuntimeError("Database not connected")
+        return AsyncIOMotorGridFSBucket(cls.db, bucket_name=settings.gridfs_bucket_name)
+
     @classmethod
-    def get_collection(cls):
-        # Retrieve the metadata collection object
+    def get_gridfs_files(cls):
+        # Retrieve the files collection of the GridFS bucket (file metadata, without the chunks)
         if cls.db is None:
             raise RuntimeError("Database not connected")
-        return cls.db[settings.collection_name]
-    
+        return cls.db[f"{settings.gridfs_bucket_name}.files"]
+
     @classmethod
     async def health_check(cls) -> bool:
         # Perform a health check on the MongoDB connection
@@ -72,9 +206,9 @@ class Database:
             await cls.client.admin.command('ping')
             return True
         except Exception as e:
-            logger.error(f"Database health check failed: {e}")
+            logger.error("Database health check failed: %s", e)
             return False
 
 
 # Singleton db instance
-db = Database()
\ No newline at end of file
+db = Database()
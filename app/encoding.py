@@ -0,0 +1,61 @@
+import gzip
+from typing import Dict, Iterable, List, Optional
+
+from app.config import settings
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, without it only gzip is stored
+    brotli = None
+
+
+# Every encoding that may be stored on a record, and the ones this process can produce (in order of preference)
+KNOWN_ENCODINGS = ("br", "gzip")
+ENCODINGS = KNOWN_ENCODINGS if brotli is not None else ("gzip",)
+
+
+def compress(data: bytes) -> Dict[str, bytes]:
+    # Precompress a body in every supported encoding.
+    # Small bodies, and encodings that don't make the body smaller, are skipped.
+    if len(data) < settings.compression_min_bytes:
+        return {}
+
+    encoded = {}
+    for encoding in ENCODINGS:
+        if encoding == "br":
+            compressed = brotli.compress(data, quality=settings.brotli_quality)
+        else:
+            compressed = gzip.compress(data, compresslevel=settings.gzip_level, mtime=0)
+        if len(compressed) < len(data):
+            encoded[encoding] = compressed
+    return encoded
+
+
+def acceptable_encodings(accept_encoding: Optional[str], available: Iterable[str] = KNOWN_ENCODINGS) -> List[str]:
+    # Encodings from `available` the client accepts, best first (by q-value, then by our preference).
+    # Identity is always acceptable and is not included. Stored bodies are sent as-is, so serving
+    # an encoding doesn't need its compression library.
+    if not accept_encoding:
+        return []
+
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+
+    ranked = []
+    for preference, encoding in enumerate(KNOWN_ENCODINGS):
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if encoding in available and weight > 0:
+            ranked.append((-weight, preference, encoding))
+    return [encoding for _, _, encoding in sorted(ranked)]
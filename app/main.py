@@ -1,37 +1,72 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, status
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Header, Query, Response, status
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
+from app.config import settings
 from app.database import db
 from app.models import (
     URLRequest, 
     MetadataResponse, 
     MetadataCreateResponse,
     MetadataAcceptedResponse,
-    MetadataStatus
+    MetadataStatus,
+    ProfilingConfig,
+    WarmupRequest
 )
 from app.repository import MetadataRepository
 from app.collector import MetadataCollector
+from app.resilience import CircuitOpenError, negative_cache, circuit_breaker
+from app.notifier import notifier
+from app.timing import fetch_stats
+from app.profiling import profiler, ProfilingMiddleware
+from app.streaming import parse_byte_range, page_source_etag, if_range_matches, RangeNotSatisfiable
+from app.shared_cache import shared_cache
+from app.encoding import acceptable_encodings
+from app.structured_logging import setup_logging, dropped_records
+from app.warmup import access_tracker, warmer
 
-# Set up logging configuration
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Set up logging: JSON lines written by a background thread, off the event loop
+setup_logging()
 logger = logging.getLogger(__name__)
 
+# References to collections started outside of BackgroundTasks, so they are not garbage collected
+_collection_tasks = set()
+
+
+async def purge_retired_sources():
+    # Delete replaced GridFS page sources once the streams reading them had time to finish
+    while True:
+        await asyncio.sleep(settings.gridfs_purge_interval)
+        if db.is_ready():
+            await MetadataRepository.purge_retired_files()
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Handles startup and shutdown events for the application
 
     logger.info("Starting up application...")
-    await db.connect()
+    if settings.shared_cache_enabled:
+        shared_cache.open()
+    # Connecting happens in the background, /ready reports when the database is usable
+    db.start()
+    access_tracker.start()
+    purge_task = asyncio.create_task(purge_retired_sources())
+    if settings.warmup_on_startup:
+        # Runs once the database is connected, /ready waits for it up to the configured threshold
+        warmer.start(gate_readiness=True)
     yield
 
     logger.info("Shutting down application...")
+    purge_task.cancel()
+    await warmer.stop()
+    await access_tracker.stop()
     await db.disconnect()
+    shared_cache.close()
 
 
 app = FastAPI(
@@ -42,16 +77,84 @@ app = FastAPI(
 )
 
 
+# Sampled profiling of slow requests, a pass-through unless enabled via /admin/profiling
+app.add_middleware(ProfilingMiddleware)
+
+
 async def background_collect_metadata(url: str):
         # Collect metadata for a URL in the background
 
-    logger.info(f"Starting background collection for {url}")
+    logger.info("Starting background collection for %s", url, extra={"url": url})
     
-    metadata, status = await MetadataCollector.collect_metadata(url)
+    try:
+        metadata, status = await MetadataCollector.collect_metadata(url)
+        
+        await MetadataRepository.create_or_update(metadata)
+        
+        logger.info("Completed background collection for %s with status %s", url, status, extra={"url": url})
+    except CircuitOpenError:
+        # Nothing was fetched, the stored record is left as it is (a pending one is retried once abandoned)
+        pass
+    finally:
+        # Wake up any long-polling GET requests for this URL
+        notifier.finish(url)
+
+
+def encoded_response(body: bytes, encoding: Optional[str]) -> Response:
+    # Send a serialized metadata response as-is, optionally with its stored content encoding
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def metadata_response(url: str, document: Dict, generations: Optional[Dict], encodings: List[str]) -> Response:
+    # Pick the best precompressed response the client accepts, falling back to serializing the record.
+    # Whatever is sent is shared with the other workers through the shared cache, unless
+    # `generations` is None (the record may be stale and must not outlive an invalidation).
+    stored = document.get("response_encodings") or {}
+    encoding = next((candidate for candidate in encodings if stored.get(candidate)), None)
+    if encoding:
+        body = stored[encoding]
+    else:
+        body = MetadataResponse(**document).model_dump_json().encode("utf-8")
     
-    await MetadataRepository.create_or_update(metadata)
+    if generations is not None:
+        shared_cache.put(url, body, generations[encoding], encoding)
+    return encoded_response(body, encoding)
+
+
+def start_collection(url: str, wait: float, background_tasks: BackgroundTasks):
+    # Only one collection per URL runs in this process at a time
+    if notifier.start(url):
+        if wait:
+            # Background tasks only run after the response is sent, so start it now
+            task = asyncio.create_task(background_collect_metadata(url))
+            _collection_tasks.add(task)
+            task.add_done_callback(_collection_tasks.discard)
+        else:
+            background_tasks.add_task(background_collect_metadata, url)
+
+
+def is_abandoned(document: Dict) -> bool:
+    # A pending record that no collection could still be working on
+    updated_at = document.get("updated_at")
+    age = settings.request_timeout + settings.pending_abandon_margin
+    return updated_at is None or datetime.utcnow() - updated_at > timedelta(seconds=age)
+
+
+def pending_response(url: str) -> JSONResponse:
+    # 202 Accepted response for a URL whose collection is still in progress
+    response_data = MetadataAcceptedResponse(
+        message="Request accepted. Metadata collection in progress.",
+        url=url,
+        status=MetadataStatus.PENDING
+    )
     
-    logger.info(f"Completed background collection for {url} with status {status}")
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=response_data.model_dump()
+    )
 
 
 @app.get("/", tags=["Health"])
@@ -63,19 +166,35 @@ async def root():
     }
 
 
+def retry_deferred(url: str, error_type: str) -> HTTPException:
+    # 503 for a fetch that was not attempted, retry once the URL's backoff expires
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"Metadata collection recently failed ({error_type}), retry deferred",
+        headers={"Retry-After": str(negative_cache.retry_after(url) or settings.negative_cache_base_ttl)}
+    )
+
+
 @app.post(
     "/metadata",
     response_model=MetadataCreateResponse,
     status_code=status.HTTP_201_CREATED,
     tags=["Metadata"],
     summary="Create metadata record for a URL",
-    description="Collects headers, cookies, and page source for the given URL and stores in database"
+    description="Collects headers, cookies, and page source for the given URL and stores in database",
+    responses={503: {"description": "The URL is backing off or its host is failing, nothing was fetched or stored (see Retry-After)"}}
 )
 async def create_metadata(request: URLRequest):
         # Endpoint to create a metadata record for a given URL
 
     url = str(request.url)
     
+    # Recently failed URLs are not refetched until their backoff expires
+    backoff = negative_cache.get(url)
+    if backoff:
+        logger.info("Skipping fetch for %s, backing off after %s", url, backoff["error_type"], extra={"url": url})
+        raise retry_deferred(url, backoff["error_type"])
+    
     try:
         # Synchronously collect metadata for the POST request
         metadata, collect_status = await MetadataCollector.collect_metadata(url)
@@ -94,9 +213,13 @@ async def create_metadata(request: URLRequest):
             url=url,
             status=collect_status
         )
+    
+    except CircuitOpenError as e:
+        # The host is failing, keep whatever is stored for the URL
+        raise retry_deferred(url, e.error_type)
         
     except Exception as e:
-        logger.error(f"Error creating metadata for {url}: {e}")
+        logger.error("Error creating metadata for %s: %s", url, e, extra={"url": url})
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to create metadata: {str(e)}"
@@ -108,9 +231,17 @@ async def create_metadata(request: URLRequest):
     response_model=MetadataResponse,
     tags=["Metadata"],
     summary="Retrieve metadata for a URL",
-    description="Returns cached metadata if available, otherwise triggers background collection and returns 202 Accepted"
+    description=(
+        "Returns cached metadata if available, otherwise triggers background collection and returns 202 Accepted. "
+        "With `wait`, the request is held open for up to that many seconds until the collection finishes."
+    )
 )
-async def get_metadata(url: str, background_tasks: BackgroundTasks):
+async def get_metadata(
+    url: str,
+    background_tasks: BackgroundTasks,
+    wait: float = Query(0, ge=0, le=settings.long_poll_max_wait, description="Seconds to wait for a pending collection"),
+    accept_encoding: Optional[str] = Header(None)
+):
         # Endpoint to retrieve metadata for a given URL
 
     if not url:
@@ -119,39 +250,138 @@ async def get_metadata(url: str, background_tasks: BackgroundTasks):
             detail="URL parameter is required"
         )
     
+    # Access counts rank the hottest records for cache warm-up
+    access_tracker.record(url)
+    
+    # Precompressed responses the client accepts, best first, identity (None) last
+    encodings = acceptable_encodings(accept_encoding)
+    
     try:
+        # Serve finished records straight from the shared cache, without touching MongoDB
+        for encoding in encodings + [None]:
+            cached = shared_cache.get(url, encoding)
+            if cached is not None:
+                return encoded_response(cached, encoding)
+        
+        # Read the generations before the db, so a concurrent update prevents caching a stale record
+        generations = {encoding: shared_cache.generation(url, encoding) for encoding in encodings + [None]}
+        
         # Check if metadata exists in the db
-        existing_metadata = await MetadataRepository.get_by_url(url)
+        existing_metadata = await MetadataRepository.get_by_url(url, response_encodings=encodings)
         
-        if existing_metadata:
-            return MetadataResponse(**existing_metadata)
+        if db.reads_from_secondaries():
+            if existing_metadata is None:
+                # A lagging secondary may not have the record yet, confirm the miss on the primary
+                existing_metadata = await MetadataRepository.get_by_url(url, response_encodings=encodings, fresh=True)
+            else:
+                # Records read from a secondary can be older than the last invalidation, don't cache them
+                generations = None
         
-        else:
+        if existing_metadata and existing_metadata["status"] != MetadataStatus.PENDING:
+            return metadata_response(url, existing_metadata, generations, encodings)
+        
+        if not existing_metadata:
             # Record doesn't exist - create pending and trigger background collection
-            logger.info(f"Cache miss for {url}, triggering background collection")
+            logger.info("Cache miss for %s, triggering background collection", url, extra={"url": url})
             
             await MetadataRepository.create_pending(url)
-            
-            background_tasks.add_task(background_collect_metadata, url)
-            
-            response_data = MetadataAcceptedResponse(
-                message="Request accepted. Metadata collection in progress.",
-                url=url,
-                status=MetadataStatus.PENDING
-            )
-            
-            return JSONResponse(
-                status_code=status.HTTP_202_ACCEPTED,
-                content=response_data.model_dump()
-            )
+            start_collection(url, wait, background_tasks)
+        
+        elif not notifier.is_in_flight(url) and is_abandoned(existing_metadata):
+            # Left pending by a worker that stopped before finishing, take it over (once across workers)
+            if await MetadataRepository.claim_pending(url, existing_metadata["updated_at"]):
+                logger.info("Restarting abandoned collection for %s", url, extra={"url": url})
+                start_collection(url, wait, background_tasks)
+        
+        # Long-poll until the in-process collection finishes, then re-read the result
+        if wait and await notifier.wait(url, wait):
+            generations = {encoding: shared_cache.generation(url, encoding) for encoding in encodings + [None]}
+            finished_metadata = await MetadataRepository.get_by_url(url, response_encodings=encodings, fresh=True)
+            if finished_metadata and finished_metadata["status"] != MetadataStatus.PENDING:
+                return metadata_response(url, finished_metadata, generations, encodings)
+        
+        return pending_response(url)
             
     except Exception as e:
-        logger.error(f"Error retrieving metadata for {url}: {e}")
+        logger.error("Error retrieving metadata for %s: %s", url, e, extra={"url": url})
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to retrieve metadata: {str(e)}"
         )
 
+@app.get(
+    "/metadata/source",
+    tags=["Metadata"],
+    summary="Stream the page source of a URL",
+    description="Streams the stored page source in chunks, supports single byte ranges via the Range and If-Range headers",
+    responses={206: {"description": "Partial content"}, 416: {"description": "Range not satisfiable"}}
+)
+async def get_metadata_source(
+    url: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
+):
+        # Endpoint to stream the page source for a given URL
+
+    encodings = acceptable_encodings(accept_encoding)
+    document = await MetadataRepository.get_page_source(url, encodings=encodings)
+    
+    if not document or (document.get("page_source") is None and document.get("page_source_file_id") is None):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Page source not available"
+        )
+    
+    # Send a stored precompressed form if the client accepts one, ranges then apply to the encoded bytes
+    stored = document.get("page_source_encodings") or {}
+    encoding = next((candidate for candidate in encodings if candidate in stored), None)
+    if encoding:
+        length = stored[encoding]["length"]
+    else:
+        length = document.get("page_source_length")
+        if length is None:
+            length = len(document["page_source"].encode("utf-8"))
+    
+    # Page sources are stored as decoded text and always served as UTF-8 (Starlette adds the charset for text/*)
+    content_type = (document.get("headers") or {}).get("content-type", "text/html").split(";")[0]
+    if not content_type.startswith("text/"):
+        content_type += "; charset=utf-8"
+    headers = {"Accept-Ranges": "bytes", "Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    etag = page_source_etag(document, encoding)
+    if etag:
+        headers["ETag"] = etag
+    
+    # A resumed download of an older version gets the whole current body instead of a mixed one
+    if not if_range_matches(if_range, etag):
+        range_header = None
+    
+    try:
+        byte_range = parse_byte_range(range_header, length)
+    except RangeNotSatisfiable:
+        return Response(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={**headers, "Content-Range": f"bytes */{length}"}
+        )
+    
+    if byte_range is None:
+        start, end, status_code = 0, length - 1, status.HTTP_200_OK
+    else:
+        start, end = byte_range
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+    headers["Content-Length"] = str(max(0, end - start + 1))
+    
+    return StreamingResponse(
+        MetadataRepository.stream_page_source(document, start, end, encoding),
+        status_code=status_code,
+        media_type=content_type,
+        headers=headers
+    )
+
+
 @app.get("/health", tags=["Health"])
 async def health_check():
         # Endpoint for a full health check of the API and database
@@ -159,7 +389,8 @@ async def health_check():
     health_status = {
         "status": "healthy",
         "service": "HTTP Metadata Inventory Service",
-        "database": "disconnected"
+        "database": "disconnected",
+        "dropped_log_records": dropped_records()
     }
     
     # Check db connection health
@@ -174,7 +405,7 @@ async def health_check():
                 content=health_status
             )
     except Exception as e:
-        logger.error(f"Health check failed: {e}")
+        logger.error("Health check failed: %s", e)
         health_status["status"] = "unhealthy"
         health_status["database"] = "error"
         return JSONResponse(
@@ -185,6 +416,89 @@ async def health_check():
     return health_status
 
 
+@app.get("/live", tags=["Health"])
+async def liveness_check():
+    # Liveness probe, the process is up and the event loop is responsive
+    return {"status": "alive"}
+
+
+@app.get("/ready", tags=["Health"])
+async def readiness_check():
+    # Readiness probe, the database is connected, indexes are built and the startup warm-up is far enough
+    readiness = {
+        "status": "ready",
+        "database": "connected" if db.connected else "disconnected",
+        "indexes": "ready" if db.indexes_ready else "building",
+        "warmup": "warm" if warmer.is_warm() else "warming"
+    }
+    
+    ready = db.is_ready() and warmer.is_warm()
+    if ready:
+        try:
+            ready = await asyncio.wait_for(db.health_check(), timeout=settings.readiness_check_timeout)
+        except asyncio.TimeoutError:
+            ready = False
+        if not ready:
+            readiness["database"] = "disconnected"
+    
+    if not ready:
+        readiness["status"] = "not ready"
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content=readiness
+        )
+    
+    return readiness
+
+
+@app.get("/circuit-breakers", tags=["Health"])
+async def circuit_breaker_status():
+    # Endpoint exposing the per-host circuit breaker state
+    return {"hosts": circuit_breaker.snapshot()}
+
+
+@app.get("/stats/fetch", tags=["Health"])
+async def fetch_timing_stats():
+    # Endpoint with aggregate fetch timings per phase (connect, tls, send, ttfb, download)
+    return fetch_stats.summary()
+
+
+@app.get("/admin/profiling", tags=["Admin"])
+async def get_profiling():
+    # Endpoint with the profiler settings and the captured slow-request profiles
+    return profiler.status()
+
+
+@app.put("/admin/profiling", tags=["Admin"])
+async def configure_profiling(config: ProfilingConfig):
+    # Endpoint to enable or disable the sampling profiler at runtime
+    profiler.configure(config.enabled, config.sample_rate, config.slow_threshold_ms)
+    return profiler.status()
+
+
+@app.get("/admin/profiling/folded", tags=["Admin"], response_class=PlainTextResponse)
+async def get_profiling_folded():
+    # Endpoint with all captured profiles as folded stacks, ready for flamegraph.pl or speedscope
+    return "\n".join(profiler.folded())
+
+
+@app.get("/admin/warmup", tags=["Admin"])
+async def get_warmup():
+    # Endpoint with the progress of the current (or last) cache warm-up
+    return warmer.status()
+
+
+@app.post("/admin/warmup", tags=["Admin"], status_code=status.HTTP_202_ACCEPTED)
+async def start_warmup(request: WarmupRequest):
+    # Endpoint to start a cache warm-up in the background
+    if not warmer.start(request.urls, request.limit, request.concurrency):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A warm-up is already running"
+        )
+    return warmer.status()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
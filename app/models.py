@@ -1,5 +1,5 @@
 from pydantic import BaseModel, HttpUrl, Field
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -22,7 +22,9 @@ class MetadataResponse(BaseModel):
     headers: Optional[Dict[str, str]] = None
     cookies: Optional[Dict[str, str]] = None
     page_source: Optional[str] = None
+    page_source_length: Optional[int] = Field(None, description="Size of the page source in bytes, large ones are only served by /metadata/source")
     status: MetadataStatus
+    timing: Optional[Dict[str, float]] = None
     created_at: datetime
     updated_at: datetime
     
@@ -44,3 +46,17 @@ class MetadataAcceptedResponse(BaseModel):
     message: str
     url: str
     status: MetadataStatus = MetadataStatus.PENDING
+
+
+class ProfilingConfig(BaseModel):
+    # Request model for toggling the sampling profiler.
+    enabled: bool
+    sample_rate: float = Field(0.1, ge=0, le=1, description="Fraction of requests to profile")
+    slow_threshold_ms: float = Field(500, ge=0, description="Only keep profiles of requests slower than this")
+
+
+class WarmupRequest(BaseModel):
+    # Request model for starting a cache warm-up.
+    urls: Optional[List[str]] = Field(None, description="Seed URLs, hottest first (default: the seed file, or the most accessed records)")
+    limit: Optional[int] = Field(None, ge=1, description="Maximum number of URLs to warm")
+    concurrency: Optional[int] = Field(None, ge=1, description="Concurrent loads and collections")
@@ -0,0 +1,51 @@
+import asyncio
+import logging
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class CollectionNotifier:
+    # Tracks in-process collections per URL so waiting requests can be woken up
+    # when a collection finishes, instead of polling the database.
+
+    def __init__(self):
+        self._events: Dict[str, asyncio.Event] = {}
+
+    def is_in_flight(self, url: str) -> bool:
+        return url in self._events
+
+    def start(self, url: str) -> bool:
+        # Mark a collection as started. Returns False if one is already running for the URL.
+        if url in self._events:
+            return False
+        self._events[url] = asyncio.Event()
+        return True
+
+    def finish(self, url: str):
+        # Wake up everyone waiting on the URL
+        event = self._events.pop(url, None)
+        if event is not None:
+            event.set()
+
+    async def wait(self, url: str, timeout: float) -> bool:
+        # Wait for the in-flight collection of the URL to finish.
+        # Returns True if it finished within the timeout, False otherwise
+        # (or if nothing is being collected for the URL in this process).
+        event = self._events.get(url)
+        if event is None:
+            return False
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def reset(self):
+        # Forget every in-flight collection, waking up whoever waits on them
+        for url in list(self._events):
+            self.finish(url)
+
+
+# Singleton notifier instance
+notifier = CollectionNotifier()
@@ -0,0 +1,139 @@
+import os
+import sys
+import time
+import random
+import logging
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def fold_stack(frame) -> str:
+    # Render a frame and its callers as a folded stack ("root;...;leaf"), the flame-graph input format
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    # Opt-in sampling profiler for slow requests.
+    # While enabled, a sampled fraction of requests is profiled: a background thread
+    # snapshots the event loop thread's stack every `profiling_sample_interval` seconds,
+    # and requests slower than the threshold keep the folded stacks captured during them.
+    # The event loop is shared, so a profile also contains whatever else ran concurrently.
+
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = 0.1
+        self.slow_threshold_ms = 500.0
+        self.profiles: Deque[Dict] = deque(maxlen=settings.profiling_max_profiles)
+        self._samples: Deque[Tuple[float, str]] = deque(maxlen=100000)
+        self._active = 0
+        self._target_thread: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def configure(self, enabled: bool, sample_rate: float, slow_threshold_ms: float):
+        # Enable or disable profiling at runtime, must be called from the event loop thread
+        self.sample_rate = sample_rate
+        self.slow_threshold_ms = slow_threshold_ms
+
+        if enabled and not self.enabled:
+            self._target_thread = threading.get_ident()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+            logger.info("Profiling enabled (sample rate %s, slow threshold %s ms)", sample_rate, slow_threshold_ms)
+        elif not enabled and self.enabled:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self._samples.clear()
+            logger.info("Profiling disabled")
+
+        self.enabled = enabled
+
+    def _run(self):
+        # Sampler thread, only walks the stack while a profiled request is running
+        interval = settings.profiling_sample_interval
+        while not self._stop.wait(interval):
+            if not self._active:
+                continue
+            frame = sys._current_frames().get(self._target_thread)
+            if frame is not None:
+                self._samples.append((time.perf_counter(), fold_stack(frame)))
+
+    def begin(self) -> Optional[float]:
+        # Decide whether to profile the current request, returns a token for end()
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        self._active += 1
+        return time.perf_counter()
+
+    def end(self, token: Optional[float], method: str, path: str):
+        if token is None:
+            return
+        self._active -= 1
+
+        finished = time.perf_counter()
+        duration_ms = (finished - token) * 1000
+        if duration_ms < self.slow_threshold_ms:
+            return
+
+        stacks = Counter(stack for ts, stack in list(self._samples) if token <= ts <= finished)
+        self.profiles.append({
+            "method": method,
+            "path": path,
+            "duration_ms": round(duration_ms, 3),
+            "samples": sum(stacks.values()),
+            "captured_at": datetime.utcnow().isoformat(),
+            "folded": [f"{stack} {count}" for stack, count in stacks.most_common()]
+        })
+
+    def folded(self) -> List[str]:
+        # All captured profiles merged into one folded-stack listing (for flamegraph.pl / speedscope)
+        merged = Counter()
+        for profile in self.profiles:
+            for line in profile["folded"]:
+                stack, count = line.rsplit(" ", 1)
+                merged[stack] += int(count)
+        return [f"{stack} {count}" for stack, count in merged.most_common()]
+
+    def status(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "slow_threshold_ms": self.slow_threshold_ms,
+            "profiles": list(self.profiles)
+        }
+
+
+class ProfilingMiddleware:
+    # Plain ASGI middleware feeding the profiler.
+    # While profiling is disabled requests go straight to the app, without wrapping or buffering.
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        token = profiler.begin()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.end(token, scope["method"], scope["path"])
+
+
+# Singleton profiler instance used by the request middleware
+profiler = SamplingProfiler()
@@ -1,22 +1,75 @@
-from typing import Optional, Dict
-from datetime import datetime
+from typing import Optional, Dict, AsyncIterator, Iterable, List, Tuple
+from datetime import datetime, timedelta
+import asyncio
 import logging
 
-from app.database import db
-from app.models import MetadataStatus
+from bson import ObjectId
+from gridfs.errors import NoFile
+from pymongo import ReturnDocument, UpdateOne
+
+from app.config import settings
+from app.database import db, Route
+from app.models import MetadataStatus, MetadataResponse
+from app.shared_cache import shared_cache
+from app.encoding import KNOWN_ENCODINGS, compress
 
 logger = logging.getLogger(__name__)
 
 
+def utc_now() -> datetime:
+    # MongoDB stores milliseconds, truncating keeps responses built before and after a round trip identical
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def referenced_file_ids(document: Optional[Dict]) -> List[ObjectId]:
+    # GridFS files referenced by a metadata document (page source and its precompressed forms)
+    if not document:
+        return []
+    file_ids = [document.get("page_source_file_id")]
+    for body in (document.get("page_source_encodings") or {}).values():
+        file_ids.append(body.get("file_id"))
+    return [file_id for file_id in file_ids if file_id is not None]
+
+
+# Projection of the GridFS references of a document
+FILE_ID_PROJECTION = {
+    "page_source_file_id": 1,
+    **{f"page_source_encodings.{encoding}.file_id": 1 for encoding in KNOWN_ENCODINGS}
+}
+
+
 class MetadataRepository:
     # Repository for metadata database operations.
     
     @staticmethod
-    async def get_by_url(url: str) -> Optional[Dict]:
+    async def get_by_url(
+        url: str,
+        response_encodings: Iterable[str] = (),
+        fresh: bool = False,
+        with_page_source: bool = False
+    ) -> Optional[Dict]:
         # Retrieving metadata by URL.
+        # Precompressed bodies are left out, except the requested encodings of the response.
+        # When encodings are requested the page source is only read if none of them is stored
+        # (or `with_page_source` is set), a stored encoding already contains it.
+        # This is the hot read path, it may be served by a secondary unless `fresh` is set.
         try:
-            collection = db.get_collection()
-            document = await collection.find_one({"url": url})
+            collection = db.get_collection(Route.PRIMARY if fresh else Route.HOT_READ)
+            projection = {"page_source_encodings": 0}
+            for encoding in KNOWN_ENCODINGS:
+                if encoding not in response_encodings:
+                    projection[f"response_encodings.{encoding}"] = 0
+            skip_source = bool(response_encodings) and not with_page_source
+            document = await collection.find_one(
+                {"url": url},
+                projection={**projection, "page_source": 0} if skip_source else projection
+            )
+            
+            if skip_source and document and document.get("status") != MetadataStatus.PENDING:
+                stored = document.get("response_encodings") or {}
+                if not any(stored.get(encoding) for encoding in response_encodings):
+                    document = await collection.find_one({"url": url}, projection=projection)
             
             if document:
                 # Removing MongoDB _id field for cleaner response
@@ -25,48 +78,207 @@ class MetadataRepository:
             return document
             
         except Exception as e:
-            logger.error(f"Error retrieving metadata for {url}: {e}")
+            logger.error("Error retrieving metadata for %s: %s", url, e, extra={"url": url})
             return None
     
+    @staticmethod
+    async def upload_body(url: str, data: bytes, encoding: Optional[str] = None) -> ObjectId:
+        # Uploading a page source (or a precompressed form of it) to GridFS.
+        return await db.get_gridfs_bucket().upload_from_stream(
+            url,
+            data,
+            metadata={"url": url, "encoding": encoding}
+        )
+    
+    @staticmethod
+    async def prepare_update(metadata: Dict) -> Tuple[Dict, List[ObjectId]]:
+        # Building the upsert update for a metadata record.
+        # The page source is precompressed here and large bodies are uploaded to GridFS,
+        # the ids of the new files are returned with the update.
+        
+        # Storing the status as a string
+        metadata_to_store = metadata.copy()
+        if isinstance(metadata_to_store.get("status"), MetadataStatus):
+            metadata_to_store["status"] = metadata_to_store["status"].value
+        url = metadata_to_store["url"]
+        
+        # Build the update, removing created_at
+        update_data = {k: v for k, v in metadata_to_store.items() if k != "created_at"}
+        update_data["updated_at"] = utc_now()
+        # Encoded responses are rebuilt once the record is written
+        update_data["response_encodings"] = {}
+        
+        # Large page sources go to GridFS, the document only keeps a reference
+        new_file_ids = []
+        if "page_source" in update_data:
+            update_data["page_source_length"] = None
+            update_data["page_source_file_id"] = None
+            update_data["page_source_encodings"] = {}
+        page_source = update_data.get("page_source")
+        if page_source is not None:
+            encoded_source = page_source.encode("utf-8")
+            update_data["page_source_length"] = len(encoded_source)
+            if len(encoded_source) > settings.gridfs_threshold_bytes:
+                file_id = await MetadataRepository.upload_body(url, encoded_source)
+                new_file_ids.append(file_id)
+                update_data["page_source_file_id"] = file_id
+                update_data["page_source"] = None
+            
+            # Precompressed forms are sent to clients as-is, compressing off the event loop
+            for encoding, compressed in (await asyncio.to_thread(compress, encoded_source)).items():
+                body = {"length": len(compressed), "data": compressed, "file_id": None}
+                if len(compressed) > settings.gridfs_threshold_bytes:
+                    body["file_id"] = await MetadataRepository.upload_body(url, compressed, encoding)
+                    body["data"] = None
+                    new_file_ids.append(body["file_id"])
+                update_data["page_source_encodings"][encoding] = body
+        
+        update = {
+            "$set": update_data,
+            "$setOnInsert": {
+                "created_at": utc_now()
+            }
+        }
+        return update, new_file_ids
+    
+    @staticmethod
+    async def build_response_encodings(update: Dict, created_at: datetime) -> Optional[UpdateOne]:
+        # Building the write of the precompressed GET /metadata response of a freshly written record.
+        # The filter on updated_at only applies it if the record was not updated again in the meantime.
+        stored = update["$set"]
+        body = MetadataResponse(**{**stored, "created_at": created_at}).model_dump_json().encode("utf-8")
+        encodings = await asyncio.to_thread(compress, body)
+        if not encodings:
+            return None
+        return UpdateOne(
+            {"url": stored["url"], "updated_at": stored["updated_at"]},
+            {"$set": {"response_encodings": encodings}}
+        )
+    
+    @staticmethod
+    async def store_response_encodings(update: Dict, created_at: datetime) -> bool:
+        # Storing the precompressed GET /metadata response of a freshly written record.
+        url = update["$set"]["url"]
+        try:
+            operation = await MetadataRepository.build_response_encodings(update, created_at)
+            if operation is None:
+                return True
+            
+            await db.get_collection().bulk_write([operation])
+            # Entries cached before the encodings existed must not hide them
+            shared_cache.invalidate(url)
+            return True
+            
+        except Exception as e:
+            logger.error("Error storing encoded response for %s: %s", url, e, extra={"url": url})
+            return False
+    
     @staticmethod
     async def create_or_update(metadata: Dict) -> bool:
         # Inserting a new metadata record or update an existing one.
 
+        new_file_ids = []
         try:
             collection = db.get_collection()
             
-            # Storing the status as a string
-            metadata_to_store = metadata.copy()
-            if isinstance(metadata_to_store.get("status"), MetadataStatus):
-                metadata_to_store["status"] = metadata_to_store["status"].value
+            update, new_file_ids = await MetadataRepository.prepare_update(metadata)
             
-            # Build the update, removing created_at
-            update_data = {k: v for k, v in metadata_to_store.items() if k != "created_at"}
-            update_data["updated_at"] = datetime.utcnow()
+            previous = await collection.find_one_and_update(
+                {"url": metadata["url"]},
+                update,
+                projection={**FILE_ID_PROJECTION, "created_at": 1},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
+            )
             
-            result = await collection.update_one(
-                {"url": metadata_to_store["url"]},
-                {
-                    "$set": update_data,
-                    "$setOnInsert": {
-                        "created_at": datetime.utcnow()
-                    }
-                },
-                upsert=True
+            # Invalidate after the write, so other workers can't re-cache the old record
+            shared_cache.invalidate(metadata["url"])
+            
+            # The GridFS files of the replaced page source may still be streamed, delete them later
+            await MetadataRepository.retire_page_source_files(referenced_file_ids(previous))
+            
+            created_at = (previous or {}).get("created_at") or update["$setOnInsert"]["created_at"]
+            await MetadataRepository.store_response_encodings(update, created_at)
+            
+            logger.info("Stored metadata for %s", metadata["url"], extra={"url": metadata["url"]})
+            return True
+            
+        except Exception as e:
+            logger.error("Error storing metadata for %s: %s", metadata.get("url"), e, exc_info=True, extra={"url": metadata.get("url")})
+            # Don't leave orphaned GridFS files behind
+            for file_id in new_file_ids:
+                await MetadataRepository.delete_page_source_file(file_id)
+            return False
+    
+    @staticmethod
+    async def bulk_create_or_update(records: List[Dict]) -> bool:
+        # Upserting a batch of metadata records with a single unordered bulk write.
+
+        new_file_ids = []
+        attempted = False
+        try:
+            collection = db.get_collection()
+            urls = [record["url"] for record in records]
+            
+            # GridFS files of page sources that are about to be replaced
+            previous_file_ids = []
+            async for document in collection.find({"url": {"$in": urls}}, projection=FILE_ID_PROJECTION):
+                previous_file_ids.extend(referenced_file_ids(document))
+            
+            updates = []
+            for record in records:
+                update, file_ids = await MetadataRepository.prepare_update(record)
+                new_file_ids.extend(file_ids)
+                updates.append(update)
+            
+            attempted = True
+            await collection.bulk_write(
+                [UpdateOne({"url": update["$set"]["url"]}, update, upsert=True) for update in updates],
+                ordered=False
             )
+            for url in urls:
+                shared_cache.invalidate(url)
             
-            logger.info(f"Stored metadata for {metadata_to_store['url']}")
+            await MetadataRepository.retire_page_source_files(previous_file_ids)
+            
+            # Encoded responses need the created_at of existing records
+            created = {
+                document["url"]: document["created_at"]
+                async for document in collection.find({"url": {"$in": urls}}, projection={"url": 1, "created_at": 1})
+            }
+            try:
+                operations = {}
+                for update in updates:
+                    url = update["$set"]["url"]
+                    operation = await MetadataRepository.build_response_encodings(update, created.get(url, update["$setOnInsert"]["created_at"]))
+                    if operation is not None:
+                        operations[url] = operation
+                if operations:
+                    await collection.bulk_write(list(operations.values()), ordered=False)
+                    # Entries cached before the encodings existed must not hide them
+                    for url in operations:
+                        shared_cache.invalidate(url)
+            except Exception as e:
+                # The records are stored, they are served uncompressed until the next refresh
+                logger.error("Error storing encoded responses for %d URLs: %s", len(records), e)
+            
+            logger.info("Stored metadata for %d URLs", len(records))
             return True
             
         except Exception as e:
-            logger.error(f"Error storing metadata: {e}", exc_info=True)
+            logger.error("Error storing metadata batch: %s", e, exc_info=True)
+            # After a (partially) failed bulk write the new files may already be referenced, so keep them
+            if not attempted:
+                for file_id in new_file_ids:
+                    await MetadataRepository.delete_page_source_file(file_id)
             return False
     
     @staticmethod
     async def create_pending(url: str) -> bool:
         # Adding a new pending metadata entry for the given URL if it doesn't already exist.
+        # A lost placeholder is simply recreated by the next request, so it doesn't need the result write concern.
         try:
-            collection = db.get_collection()
+            collection = db.get_collection(Route.PENDING)
             
             pending_record = {
                 "url": url,
@@ -87,8 +299,169 @@ class MetadataRepository:
                 upsert=True
             )
             
+            if result.upserted_id is not None:
+                shared_cache.invalidate(url)
+            
+            return True
+            
+        except Exception as e:
+            logger.error("Error creating pending record for %s: %s", url, e, extra={"url": url})
+            return False
+    
+    @staticmethod
+    async def claim_pending(url: str, updated_at: Optional[datetime]) -> bool:
+        # Taking over a pending record by bumping its updated_at.
+        # Only succeeds if nobody else touched the record since it was read.
+        try:
+            collection = db.get_collection(Route.PENDING)
+            result = await collection.update_one(
+                {"url": url, "status": MetadataStatus.PENDING.value, "updated_at": updated_at},
+                {"$set": {"updated_at": datetime.utcnow()}}
+            )
+            return result.modified_count == 1
+            
+        except Exception as e:
+            logger.error("Error claiming pending record for %s: %s", url, e, extra={"url": url})
+            return False
+    
+    @staticmethod
+    async def increment_access_counts(counts: Dict[str, int]) -> bool:
+        # Adding a batch of GET access counts to existing records.
+        # Counters only rank records for warm-up, so they use the cheap pending write concern.
+        try:
+            collection = db.get_collection(Route.PENDING)
+            now = utc_now()
+            await collection.bulk_write(
+                [
+                    UpdateOne({"url": url}, {"$inc": {"access_count": count}, "$set": {"last_accessed_at": now}})
+                    for url, count in counts.items()
+                ],
+                ordered=False
+            )
+            return True
+            
+        except Exception as e:
+            logger.error("Error storing access counts for %d URLs: %s", len(counts), e)
+            return False
+    
+    @staticmethod
+    async def get_most_accessed(limit: int) -> List[str]:
+        # Retrieving the URLs of the most accessed records, hottest first.
+        try:
+            collection = db.get_collection(Route.HOT_READ)
+            cursor = collection.find(
+                {"access_count": {"$gt": 0}},
+                projection={"_id": 0, "url": 1}
+            ).sort("access_count", -1).limit(limit)
+            return [document["url"] async for document in cursor]
+            
+        except Exception as e:
+            logger.error("Error retrieving the most accessed records: %s", e)
+            return []
+    
+    @staticmethod
+    async def get_page_source(url: str, encodings: Iterable[str] = ()) -> Optional[Dict]:
+        # Retrieving only the fields needed to serve the page source of a URL,
+        # including its precompressed forms in the given encodings.
+        # Read from the primary: a stale document could reference GridFS files that were already replaced.
+        try:
+            collection = db.get_collection()
+            projection = {
+                "_id": 0,
+                "status": 1,
+                "headers": 1,
+                "page_source": 1,
+                "page_source_file_id": 1,
+                "page_source_length": 1,
+                "updated_at": 1
+            }
+            for encoding in encodings:
+                projection[f"page_source_encodings.{encoding}"] = 1
+            return await collection.find_one({"url": url}, projection=projection)
+            
+        except Exception as e:
+            logger.error("Error retrieving page source for %s: %s", url, e, extra={"url": url})
+            return None
+    
+    @staticmethod
+    async def stream_page_source(
+        document: Dict,
+        start: int,
+        end: int,
+        encoding: Optional[str] = None
+    ) -> AsyncIterator[bytes]:
+        # Yielding the bytes start..end (inclusive) of a page source, or of its precompressed form, in chunks.
+        # GridFS bodies are read chunk by chunk, so the whole body is never held in memory.
+        chunk_size = settings.source_chunk_size
+        remaining = end - start + 1
+        
+        if encoding:
+            body = document["page_source_encodings"][encoding]
+            file_id, data = body.get("file_id"), body.get("data")
+        else:
+            file_id = document.get("page_source_file_id")
+            data = document["page_source"].encode("utf-8") if file_id is None else None
+        
+        if file_id is None:
+            for offset in range(start, end + 1, chunk_size):
+                yield data[offset:min(offset + chunk_size, end + 1)]
+            return
+        
+        grid_out = await db.get_gridfs_bucket().open_download_stream(file_id)
+        try:
+            grid_out.seek(start)
+            while remaining > 0:
+                chunk = await grid_out.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            grid_out.close()
+    
+    @staticmethod
+    async def retire_page_source_files(file_ids: List[ObjectId]) -> bool:
+        # Marking replaced GridFS page sources for deletion.
+        # Streams that already read the old file id keep working until purge_retired_files() runs past the grace period.
+        if not file_ids:
+            return True
+        try:
+            await db.get_gridfs_files().update_many(
+                {"_id": {"$in": file_ids}},
+                {"$set": {"metadata.retired_at": utc_now()}}
+            )
+            return True
+            
+        except Exception as e:
+            logger.error("Error retiring page source files %s: %s", file_ids, e)
+            return False
+    
+    @staticmethod
+    async def purge_retired_files() -> int:
+        # Deleting retired GridFS page sources older than the grace period, returns how many were deleted.
+        cutoff = utc_now() - timedelta(seconds=settings.gridfs_retire_grace)
+        deleted = 0
+        try:
+            cursor = db.get_gridfs_files().find({"metadata.retired_at": {"$lte": cutoff}}, projection={"_id": 1})
+            async for document in cursor:
+                if await MetadataRepository.delete_page_source_file(document["_id"]):
+                    deleted += 1
+            
+        except Exception as e:
+            logger.error("Error purging retired page source files: %s", e)
+        return deleted
+    
+    @staticmethod
+    async def delete_page_source_file(file_id) -> bool:
+        # Removing a page source stored in GridFS.
+        try:
+            await db.get_gridfs_bucket().delete(file_id)
+            return True
+            
+        except NoFile:
+            # Already deleted (e.g. purged by another worker)
             return True
             
         except Exception as e:
-            logger.error(f"Error creating pending record: {e}")
+            logger.error("Error deleting page source file %s: %s", file_id, e)
             return False
@@ -0,0 +1,230 @@
+import math
+import time
+import logging
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Error types that indicate the host itself is struggling (as opposed to
+# returning a valid HTTP error), these count towards opening the breaker.
+BREAKER_ERROR_TYPES = {
+    "TimeoutException",
+    "ConnectTimeout",
+    "ReadTimeout",
+    "WriteTimeout",
+    "PoolTimeout",
+    "ConnectError",
+    "ReadError",
+    "WriteError",
+    "NetworkError",
+    "RemoteProtocolError",
+}
+
+
+class CircuitOpenError(Exception):
+    # Raised when a fetch is short-circuited because the host breaker is open.
+    # Carries the error type that opened the breaker, so backoffs keep counting the real failure.
+
+    def __init__(self, host: str, error_type: Optional[str] = None):
+        self.error_type = error_type or "CircuitOpenError"
+        super().__init__(f"Circuit open for {host} after {self.error_type}")
+
+
+def get_host(url: str) -> str:
+    # Extract the host (with port) used as the breaker key
+    return urlsplit(url).netloc.lower()
+
+
+def prune(entries: Dict[str, Dict], is_stale: Callable[[Dict], bool], max_entries: int):
+    # Drop stale entries once the dict is full, then the oldest ones until it is back under 90% of the cap.
+    # Entries are re-inserted on every update, so dict order is least recently updated first.
+    if len(entries) < max_entries:
+        return
+    for key in [key for key, entry in entries.items() if is_stale(entry)]:
+        del entries[key]
+    excess = len(entries) - int(max_entries * 0.9)
+    for key in list(entries)[:max(excess, 0)]:
+        del entries[key]
+
+
+class NegativeCache:
+    # Remembers recent FAILED outcomes per URL so they are not refetched on every request.
+    # The backoff doubles on each consecutive failure of the same error type and
+    # starts over when the error type changes.
+    # An expired entry is kept for another `negative_cache_max_ttl` so the next failure can
+    # still double its backoff, after that (or when the cache is full) it is evicted.
+
+    def __init__(self):
+        self._entries: Dict[str, Dict] = {}
+
+    def record_failure(self, url: str, error_type: str) -> float:
+        # Register a failed fetch and return the backoff in seconds
+        now = time.monotonic()
+        entry = self._entries.pop(url, None)
+        if entry and entry["error_type"] == error_type and not self._is_stale(entry, now):
+            failures = entry["failures"] + 1
+        else:
+            failures = 1
+
+        ttl = min(
+            settings.negative_cache_base_ttl * (2 ** (failures - 1)),
+            settings.negative_cache_max_ttl
+        )
+        self._entries[url] = {
+            "error_type": error_type,
+            "failures": failures,
+            "expires_at": now + ttl
+        }
+        prune(self._entries, lambda entry: self._is_stale(entry, now), settings.negative_cache_max_entries)
+        return ttl
+
+    @staticmethod
+    def _is_stale(entry: Dict, now: float) -> bool:
+        # Expired for so long that the failure history no longer matters
+        return entry["expires_at"] + settings.negative_cache_max_ttl <= now
+
+    def record_success(self, url: str):
+        # Forget any previous failures for the URL
+        self._entries.pop(url, None)
+
+    def get(self, url: str) -> Optional[Dict]:
+        # Return the active entry for the URL, or None if it is not backing off
+        entry = self._entries.get(url)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        if entry["expires_at"] <= now:
+            if self._is_stale(entry, now):
+                del self._entries[url]
+            return None
+        return entry
+
+    def retry_after(self, url: str) -> int:
+        # Whole seconds until the URL's backoff expires, 0 if it is not backing off
+        entry = self.get(url)
+        if entry is None:
+            return 0
+        return max(1, math.ceil(entry["expires_at"] - time.monotonic()))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def reset(self):
+        self._entries.clear()
+
+
+class CircuitBreaker:
+    # Per-host circuit breaker for timeouts and connection errors.
+    # closed -> open after `breaker_failure_threshold` consecutive failures,
+    # open -> half_open once `breaker_reset_timeout` has passed (a single trial fetch is allowed),
+    # half_open -> closed on success or back to open on failure (or another trial after `request_timeout`).
+    # Hosts without a failure for `breaker_reset_timeout` are forgotten once the table is full.
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self):
+        self._hosts: Dict[str, Dict] = {}
+
+    def _state(self, host: str) -> Dict:
+        # Re-inserted on every failure, so the least recently failing hosts are pruned first
+        entry = self._hosts.pop(host, None) or {
+            "state": self.CLOSED,
+            "failures": 0,
+            "opened_at": None,
+            "failed_at": None,
+            "error_type": None,
+            "trial_in_flight": False,
+            "trial_started_at": None
+        }
+        self._hosts[host] = entry
+        return entry
+
+    def allow(self, host: str) -> bool:
+        # Decide whether a fetch to the host may go ahead
+        entry = self._hosts.get(host)
+        if entry is None or entry["state"] == self.CLOSED:
+            return True
+
+        if entry["state"] == self.OPEN:
+            if time.monotonic() - entry["opened_at"] < settings.breaker_reset_timeout:
+                return False
+            entry["state"] = self.HALF_OPEN
+            entry["trial_in_flight"] = False
+
+        # Half open, only let a single trial request through.
+        # A trial that never reported back (e.g. a cancelled fetch) is given up after the request timeout.
+        now = time.monotonic()
+        if entry["trial_in_flight"] and now - entry["trial_started_at"] < settings.request_timeout:
+            return False
+        entry["trial_in_flight"] = True
+        entry["trial_started_at"] = now
+        return True
+
+    def error_type(self, host: str) -> Optional[str]:
+        # Type of the last failure counted against the host
+        entry = self._hosts.get(host)
+        return entry["error_type"] if entry else None
+
+    def record_success(self, host: str):
+        entry = self._hosts.get(host)
+        if entry is None:
+            return
+        if entry["state"] != self.CLOSED:
+            logger.info("Circuit closed for %s", host)
+        self._hosts.pop(host, None)
+
+    def record_failure(self, host: str, error_type: str):
+        # Only timeouts and connection errors count against the host
+        if error_type not in BREAKER_ERROR_TYPES:
+            self.record_success(host)
+            return
+
+        now = time.monotonic()
+        prune(
+            self._hosts,
+            lambda entry: now - entry["failed_at"] >= settings.breaker_reset_timeout,
+            settings.breaker_max_hosts
+        )
+        entry = self._state(host)
+        entry["failures"] += 1
+        entry["failed_at"] = now
+        entry["error_type"] = error_type
+        entry["trial_in_flight"] = False
+
+        if entry["state"] == self.HALF_OPEN or entry["failures"] >= settings.breaker_failure_threshold:
+            if entry["state"] != self.OPEN:
+                logger.warning("Circuit opened for %s after %d failures", host, entry["failures"])
+            entry["state"] = self.OPEN
+            entry["opened_at"] = now
+
+    def snapshot(self) -> Dict[str, Dict]:
+        # Current breaker state per host, for the admin endpoint
+        now = time.monotonic()
+        hosts = {}
+        for host, entry in self._hosts.items():
+            retry_after = None
+            if entry["state"] == self.OPEN:
+                retry_after = max(0.0, settings.breaker_reset_timeout - (now - entry["opened_at"]))
+            hosts[host] = {
+                "state": entry["state"],
+                "consecutive_failures": entry["failures"],
+                "retry_after_seconds": retry_after
+            }
+        return hosts
+
+    def __len__(self) -> int:
+        return len(self._hosts)
+
+    def reset(self):
+        self._hosts.clear()
+
+
+# Singleton instances shared by the collector and the API
+negative_cache = NegativeCache()
+circuit_breaker = CircuitBreaker()
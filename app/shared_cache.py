@@ -0,0 +1,180 @@
+import os
+import time
+import mmap
+import fcntl
+import struct
+import hashlib
+import logging
+from typing import Optional
+
+from app.config import settings
+from app.encoding import KNOWN_ENCODINGS
+
+logger = logging.getLogger(__name__)
+
+
+MAGIC = b"MDCACHE2"
+# File header: magic, number of slots, slot size
+FILE_HEADER = struct.Struct("<8sII")
+FILE_HEADER_SIZE = 64
+# Slot header: sequence (odd while being written), generation, URL hash, written at (unix time), payload length
+SLOT_HEADER = struct.Struct("<QQ16sdI")
+SLOT_HEADER_SIZE = 48
+
+
+def url_key(url: str, encoding: Optional[str] = None) -> bytes:
+    # Every content encoding of a URL's response is cached as its own entry
+    name = f"{encoding}\n{url}" if encoding else url
+    return hashlib.blake2b(name.encode("utf-8"), digest_size=16).digest()
+
+
+class SharedMetadataCache:
+    # Cache of serialized metadata responses shared by all worker processes through a memory-mapped file.
+    #
+    # The file is split into fixed-size slots, a URL maps to one slot by its hash (direct mapped,
+    # a colliding URL simply evicts the previous entry). Writers take an exclusive flock on the file;
+    # readers are lock-free and use the slot sequence number as a seqlock, retrying as a miss
+    # if a write happened while they were copying the payload.
+    #
+    # Every slot also has a generation that is bumped on invalidation. Readers grab the generation
+    # before going to MongoDB and put() only succeeds if it is unchanged, so a record updated
+    # (and invalidated) by another worker in the meantime is never cached with stale data.
+    #
+    # Entries older than `shared_cache_ttl` are misses. That bounds staleness from writers that
+    # can't invalidate this file: other hosts, and writes made while the service was down
+    # (the file outlives restarts).
+
+    def __init__(self):
+        self.slots = 0
+        self.slot_size = 0
+        self._fd: Optional[int] = None
+        self._users_fd: Optional[int] = None
+        self._mm: Optional[mmap.mmap] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._mm is not None
+
+    def open(self, path: Optional[str] = None, slots: Optional[int] = None, slot_size: Optional[int] = None):
+        # Open (and if needed create) the cache file, safe to call from every worker.
+        # Every process that has the file mapped holds a shared lock on `<path>.users`. A file with
+        # another layout is only reformatted when nobody has it mapped (resizing it under a mapping
+        # raises SIGBUS there), otherwise the cache stays disabled in this process.
+        path = path or settings.shared_cache_path
+        self.slots = slots or settings.shared_cache_slots
+        self.slot_size = slot_size or settings.shared_cache_slot_size
+        size = FILE_HEADER_SIZE + self.slots * self.slot_size
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._users_fd = os.open(f"{path}.users", os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            header = os.pread(self._fd, FILE_HEADER.size, 0)
+            expected = FILE_HEADER.pack(MAGIC, self.slots, self.slot_size)
+            if header != expected or os.fstat(self._fd).st_size != size:
+                if os.fstat(self._fd).st_size and not self._lock_users_exclusive():
+                    logger.error(
+                        "Shared metadata cache at %s is in use with a different layout or version, "
+                        "not using it (%d slots of %d bytes requested)", path, self.slots, self.slot_size
+                    )
+                    self.close()
+                    return
+                # New file, or a different layout nobody uses anymore: start from an empty cache
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, expected, 0)
+            self._mm = mmap.mmap(self._fd, size)
+            # Taken while the file lock is held, so a process reformatting the file always sees it
+            fcntl.flock(self._users_fd, fcntl.LOCK_SH)
+        finally:
+            if self._fd is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+        logger.info("Shared metadata cache at %s (%d slots of %d bytes)", path, self.slots, self.slot_size)
+
+    def _lock_users_exclusive(self) -> bool:
+        # Whether no other process has the cache file mapped
+        try:
+            fcntl.flock(self._users_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._users_fd is not None:
+            os.close(self._users_fd)
+            self._users_fd = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _offset(self, key: bytes) -> int:
+        return FILE_HEADER_SIZE + (int.from_bytes(key[:8], "little") % self.slots) * self.slot_size
+
+    def get(self, url: str, encoding: Optional[str] = None) -> Optional[bytes]:
+        # Return the cached payload for the URL, None on a miss
+        if self._mm is None:
+            return None
+
+        key = url_key(url, encoding)
+        offset = self._offset(key)
+        sequence, _, slot_key, written_at, length = SLOT_HEADER.unpack_from(self._mm, offset)
+        if sequence % 2 or slot_key != key or not length:
+            return None
+        if time.time() - written_at >= settings.shared_cache_ttl:
+            return None
+
+        start = offset + SLOT_HEADER_SIZE
+        payload = self._mm[start:start + length]
+
+        # A concurrent write changed the slot while we were reading it
+        if SLOT_HEADER.unpack_from(self._mm, offset)[0] != sequence:
+            return None
+        return payload
+
+    def generation(self, url: str, encoding: Optional[str] = None) -> int:
+        # Current generation of the URL's slot, to be passed back to put()
+        if self._mm is None:
+            return 0
+        return SLOT_HEADER.unpack_from(self._mm, self._offset(url_key(url, encoding)))[1]
+
+    def put(self, url: str, payload: bytes, generation: int, encoding: Optional[str] = None) -> bool:
+        # Store the payload if the slot was not invalidated since `generation` was read
+        if self._mm is None or len(payload) > self.slot_size - SLOT_HEADER_SIZE:
+            return False
+
+        key = url_key(url, encoding)
+        offset = self._offset(key)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            sequence, current_generation, _, _, _ = SLOT_HEADER.unpack_from(self._mm, offset)
+            if current_generation != generation:
+                return False
+            SLOT_HEADER.pack_into(self._mm, offset, sequence + 1, generation, key, 0.0, 0)
+            start = offset + SLOT_HEADER_SIZE
+            self._mm[start:start + len(payload)] = payload
+            SLOT_HEADER.pack_into(self._mm, offset, sequence + 2, generation, key, time.time(), len(payload))
+            return True
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def invalidate(self, url: str):
+        # Drop the URL's slots (all encodings) and bump their generation so in-flight put()s are rejected
+        if self._mm is None:
+            return
+
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            for encoding in (None,) + KNOWN_ENCODINGS:
+                offset = self._offset(url_key(url, encoding))
+                sequence, generation, _, _, _ = SLOT_HEADER.unpack_from(self._mm, offset)
+                SLOT_HEADER.pack_into(self._mm, offset, sequence + 2, generation + 1, bytes(16), 0.0, 0)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+# Singleton cache instance, opened at startup when SHARED_CACHE_ENABLED is set
+shared_cache = SharedMetadataCache()
@@ -0,0 +1,54 @@
+from typing import Dict, Optional, Tuple
+
+
+class RangeNotSatisfiable(Exception):
+    # Raised when a Range header cannot be served for the body length.
+    pass
+
+
+def parse_byte_range(header: Optional[str], length: int) -> Optional[Tuple[int, int]]:
+    # Parse a single-range "Range: bytes=..." header into an inclusive (start, end) pair.
+    # Returns None when the whole body should be sent (no header, other units or multiple ranges).
+    if not header:
+        return None
+
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    first, separator, last = spec.strip().partition("-")
+    if not separator:
+        return None
+    try:
+        if not first:
+            # Suffix range: the last N bytes, none of an empty body
+            suffix = int(last)
+            if suffix <= 0 or length == 0:
+                raise RangeNotSatisfiable(header)
+            return max(0, length - suffix), length - 1
+
+        start = int(first)
+        end = int(last) if last else length - 1
+    except ValueError:
+        return None
+
+    if start >= length or end < start:
+        raise RangeNotSatisfiable(header)
+    return start, min(end, length - 1)
+
+
+def page_source_etag(document: Dict, encoding: Optional[str] = None) -> Optional[str]:
+    # Strong ETag of a stored page source representation, changes whenever the record is rewritten
+    updated_at = document.get("updated_at")
+    if updated_at is None:
+        return None
+    version = f"{int(updated_at.timestamp() * 1000):x}"
+    return f'"{version}-{encoding}"' if encoding else f'"{version}"'
+
+
+def if_range_matches(header: Optional[str], etag: Optional[str]) -> bool:
+    # Whether a Range request may be honoured given its If-Range header.
+    # Only entity tags are compared (strongly), an HTTP date never matches so the full body is sent.
+    if not header:
+        return True
+    return etag is not None and header.strip() == etag
@@ -0,0 +1,161 @@
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import traceback
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, TextIO, Tuple
+
+from app.config import settings
+
+
+# Attributes every LogRecord has, anything else was passed through `extra` and is emitted as a field
+STANDARD_ATTRIBUTES = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime", "taskName"}
+
+# Loggers that configure their own (synchronous) handlers, rerouted through the queue
+ROUTED_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+
+class JsonFormatter(logging.Formatter):
+    # One JSON object per line, with `extra` fields (url, status, ...) as top-level keys
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in STANDARD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = "".join(traceback.format_exception(*record.exc_info)).rstrip()
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    # Limits repetitive per-URL messages (records logged with extra={"url": ...}).
+    # Records sharing a logger and message template get `burst` entries per `window` seconds,
+    # warnings and errors get the larger `warning_burst` so failures of distinct URLs stay visible.
+    # The first record let through after that carries the number of suppressed ones.
+
+    def __init__(self, burst: int, window: float, warning_burst: Optional[int] = None):
+        super().__init__()
+        self.burst = burst
+        self.warning_burst = burst if warning_burst is None else warning_burst
+        self.window = window
+        self._lock = threading.Lock()
+        # (logger, template) -> [window start, records in window, suppressed]
+        self._counters: Dict[Tuple[str, str], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "url"):
+            return True
+
+        now = time.monotonic()
+        key = (record.name, str(record.msg))
+        burst = self.warning_burst if record.levelno >= logging.WARNING else self.burst
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None or now - counter[0] >= self.window:
+                suppressed = counter[2] if counter else 0
+                self._counters[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if counter[1] < burst:
+                counter[1] += 1
+                return True
+            counter[2] += 1
+            return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    # Hands records to the listener thread without formatting them.
+    # Message args and exceptions are rendered by the listener, and when the queue is full
+    # records are dropped (and counted) instead of blocking the event loop.
+    # Once there is room again, a warning with the number of dropped records is queued first.
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._unreported = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        # Called with the handler lock held
+        try:
+            if self._unreported:
+                self.queue.put_nowait(logging.getLogger(__name__).makeRecord(
+                    __name__, logging.WARNING, __file__, 0,
+                    "Dropped %d log records, the log queue was full", (self._unreported,), None,
+                    extra={"dropped": self._unreported}
+                ))
+                self._unreported = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._unreported += 1
+
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[NonBlockingQueueHandler] = None
+
+
+def setup_logging(stream: Optional[TextIO] = None, level: Optional[str] = None, log_format: Optional[str] = None):
+    # Route all logging through a bounded queue drained by a background thread that writes to `stream`.
+    # Safe to call again, the previous pipeline is flushed and replaced.
+    global _listener, _handler
+    shutdown_logging()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    if (log_format or settings.log_format) == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    _handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.log_queue_size))
+    _handler.addFilter(RateLimitFilter(
+        settings.log_rate_limit_burst,
+        settings.log_rate_limit_window,
+        settings.log_rate_limit_warning_burst
+    ))
+
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(level or settings.log_level)
+
+    for name in ROUTED_LOGGERS:
+        routed = logging.getLogger(name)
+        for handler in routed.handlers[:]:
+            routed.removeHandler(handler)
+        routed.propagate = True
+
+    _listener = QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    # Stop the listener thread once everything queued has been written
+    global _listener, _handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+
+
+def dropped_records() -> int:
+    # Records dropped because the queue was full
+    return _handler.dropped if _handler is not None else 0
+
+
+atexit.register(shutdown_logging)
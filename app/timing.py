@@ -0,0 +1,117 @@
+import time
+import statistics
+from collections import deque
+from typing import Deque, Dict, Optional
+
+import httpx
+
+from app.config import settings
+
+
+# httpcore trace events mapped to the fetch phase they belong to.
+# httpcore resolves DNS inside connect_tcp, so "connect" covers DNS + TCP.
+TRACE_PHASES = {
+    "connect_tcp": "connect",
+    "start_tls": "tls",
+    "send_request_headers": "send",
+    "send_request_body": "send",
+    "receive_response_headers": "ttfb",
+    "receive_response_body": "download",
+}
+
+PHASES = ("setup", "connect", "tls", "send", "ttfb", "download", "total")
+
+
+class FetchTimer:
+    # Per-fetch timing breakdown built from httpx event hooks and the httpcore trace extension.
+    # Durations are summed over every request of the fetch (redirects included).
+
+    def __init__(self):
+        self.requests = 0
+        self._durations = dict.fromkeys(PHASES, 0.0)
+        self._started: Dict[str, float] = {}
+        self._start = time.perf_counter()
+
+    @property
+    def event_hooks(self) -> Dict:
+        return {"request": [self.on_request]}
+
+    @property
+    def extensions(self) -> Dict:
+        return {"trace": self.trace}
+
+    async def on_request(self, request: httpx.Request):
+        # Called for the initial request and every redirect.
+        # Everything before the first request (client and SSL context creation) counts as setup.
+        if self.requests == 0:
+            self._durations["setup"] = time.perf_counter() - self._start
+        self.requests += 1
+
+    async def trace(self, event_name: str, info: Dict):
+        # Event names look like "http11.receive_response_headers.started"
+        _, name, stage = event_name.rsplit(".", 2)
+        phase = TRACE_PHASES.get(name)
+        if phase is None:
+            return
+
+        now = time.perf_counter()
+        if stage == "started":
+            self._started[name] = now
+        elif name in self._started:
+            self._durations[phase] += now - self._started.pop(name)
+
+    def breakdown(self) -> Dict[str, float]:
+        # Phase durations in milliseconds, plus the number of requests made
+        self._durations["total"] = time.perf_counter() - self._start
+        timing = {phase: round(seconds * 1000, 3) for phase, seconds in self._durations.items()}
+        timing["requests"] = self.requests
+        return timing
+
+
+class FetchStats:
+    # Aggregate timing stats over a sliding window of recent fetches
+
+    def __init__(self, window: Optional[int] = None):
+        self.window = window or settings.fetch_stats_window
+        self.fetches = 0
+        self.failures = 0
+        self._samples: Dict[str, Deque[float]] = {
+            phase: deque(maxlen=self.window) for phase in PHASES
+        }
+
+    def record(self, timing: Dict[str, float], failed: bool = False):
+        self.fetches += 1
+        if failed:
+            self.failures += 1
+        for phase in PHASES:
+            if phase in timing:
+                self._samples[phase].append(timing[phase])
+
+    def summary(self) -> Dict:
+        phases = {}
+        for phase, samples in self._samples.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            phases[phase] = {
+                "mean_ms": round(statistics.fmean(ordered), 3),
+                "p50_ms": ordered[len(ordered) // 2],
+                "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                "max_ms": ordered[-1],
+            }
+        return {
+            "fetches": self.fetches,
+            "failures": self.failures,
+            "window": self.window,
+            "phases": phases
+        }
+
+    def reset(self):
+        self.fetches = 0
+        self.failures = 0
+        for samples in self._samples.values():
+            samples.clear()
+
+
+# Singleton stats instance fed by the collector
+fetch_stats = FetchStats()
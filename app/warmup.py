@@ -0,0 +1,250 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.database import db
+from app.collector import MetadataCollector
+from app.crawler import parse_line, read_urls
+from app.encoding import KNOWN_ENCODINGS
+from app.models import MetadataResponse, MetadataStatus
+from app.notifier import notifier
+from app.repository import MetadataRepository
+from app.resilience import CircuitOpenError, negative_cache
+from app.shared_cache import shared_cache
+
+logger = logging.getLogger(__name__)
+
+
+class AccessTracker:
+    # Counts GET /metadata accesses per URL in memory and adds them to the records in batches,
+    # so ranking the hottest records costs one bulk write per interval instead of a write per request
+
+    def __init__(self):
+        self._counts: Counter = Counter()
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, url: str):
+        self._counts[url] += 1
+
+    async def flush(self) -> int:
+        # Write the pending counts, returns the number of URLs flushed.
+        # A failed batch is dropped, the counts only rank records for warm-up.
+        counts, self._counts = self._counts, Counter()
+        if not counts:
+            return 0
+        await MetadataRepository.increment_access_counts(dict(counts))
+        return len(counts)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.access_flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Stop the flush loop and write what is left
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if db.connected:
+            await self.flush()
+
+
+def cache_document(url: str, document: Dict, generations: Dict) -> bool:
+    # Put the serialized response of a record, and every stored encoding of it, into the shared cache
+    if not shared_cache.enabled:
+        return False
+    body = MetadataResponse(**document).model_dump_json().encode("utf-8")
+    cached = shared_cache.put(url, body, generations[None])
+    for encoding, encoded in (document.get("response_encodings") or {}).items():
+        if encoded and encoding in generations:
+            shared_cache.put(url, encoded, generations[encoding], encoding)
+    return cached
+
+
+class CacheWarmer:
+    # Warms the service up after a deploy: the hottest records (a seed list, the seed file,
+    # or the most accessed records) are loaded into the shared cache, and the ones that are
+    # missing, still pending or older than `warmup_max_age` are collected first.
+    # When started with gate_readiness, /ready waits until `warmup_ready_threshold`
+    # of the URLs have been processed.
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._gating = False
+        self.progress = self._new_progress("idle", None, 0)
+
+    @staticmethod
+    def _new_progress(state: str, source: Optional[str], total: int) -> Dict:
+        return {
+            "state": state,
+            "source": source,
+            "total": total,
+            "processed": 0,
+            "loaded": 0,
+            "collected": 0,
+            "cached": 0,
+            "skipped": 0,
+            "failed": 0,
+            "started_at": None,
+            "finished_at": None
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(
+        self,
+        urls: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        gate_readiness: bool = False
+    ) -> bool:
+        # Start a warm-up in the background, False if one is already running
+        if self.running:
+            return False
+        self._gating = gate_readiness and settings.warmup_ready_threshold > 0
+        self.progress = self._new_progress("starting", None, 0)
+        self._task = asyncio.create_task(self.run(urls, limit, concurrency))
+        return True
+
+    async def stop(self):
+        if self.running:
+            self._task.cancel()
+        self._task = None
+        self._gating = False
+
+    def is_warm(self) -> bool:
+        # Whether the startup warm-up has reached the readiness threshold (always True without one).
+        # Once reached it stays reached, a later warm-up never takes the service out of rotation.
+        if self._gating:
+            progress = self.progress
+            finished = progress["state"] in ("done", "failed")
+            if finished or (progress["total"] and progress["processed"] / progress["total"] >= settings.warmup_ready_threshold):
+                self._gating = False
+        return not self._gating
+
+    def status(self) -> Dict:
+        progress = dict(self.progress)
+        progress["percent"] = round(progress["processed"] / progress["total"] * 100, 1) if progress["total"] else 0.0
+        progress["ready_threshold"] = settings.warmup_ready_threshold
+        progress["warm"] = self.is_warm()
+        return progress
+
+    async def select_urls(self, urls: Optional[List[str]], limit: int) -> List[str]:
+        # Seed URLs from the request, the seed file, or the most accessed records (in that order)
+        if urls:
+            self.progress["source"] = "request"
+            selected = list(dict.fromkeys(url for url in map(parse_line, urls) if url))
+        elif settings.warmup_seed_file:
+            self.progress["source"] = "seed_file"
+            with open(settings.warmup_seed_file, encoding="utf-8") as seed_file:
+                selected = list(read_urls(seed_file))
+        else:
+            self.progress["source"] = "access_count"
+            selected = await MetadataRepository.get_most_accessed(limit)
+        return selected[:limit]
+
+    def needs_collection(self, document: Optional[Dict]) -> bool:
+        # Missing and pending records return 202 to clients, stale ones are refreshed as well
+        if document is None or document["status"] == MetadataStatus.PENDING:
+            return True
+        updated_at = document.get("updated_at")
+        return updated_at is None or datetime.utcnow() - updated_at > timedelta(seconds=settings.warmup_max_age)
+
+    async def warm_url(self, url: str):
+        # Generations are read before the database, like on the GET path
+        generations = {encoding: shared_cache.generation(url, encoding) for encoding in (None,) + KNOWN_ENCODINGS}
+        document = await MetadataRepository.get_by_url(url, response_encodings=KNOWN_ENCODINGS, fresh=True, with_page_source=True)
+
+        if self.needs_collection(document):
+            # Leave URLs that are backing off or already being collected by this process alone
+            if negative_cache.get(url) or not notifier.start(url):
+                self.progress["skipped"] += 1
+                return
+            try:
+                metadata, _ = await MetadataCollector.collect_metadata(url)
+                stored = await MetadataRepository.create_or_update(metadata)
+            except CircuitOpenError:
+                self.progress["skipped"] += 1
+                return
+            finally:
+                notifier.finish(url)
+            if not stored:
+                self.progress["failed"] += 1
+                return
+            self.progress["collected"] += 1
+
+            generations = {encoding: shared_cache.generation(url, encoding) for encoding in (None,) + KNOWN_ENCODINGS}
+            document = await MetadataRepository.get_by_url(url, response_encodings=KNOWN_ENCODINGS, fresh=True, with_page_source=True)
+            if document is None:
+                self.progress["failed"] += 1
+                return
+        else:
+            self.progress["loaded"] += 1
+
+        if cache_document(url, document, generations):
+            self.progress["cached"] += 1
+
+    async def run(self, urls: Optional[List[str]] = None, limit: Optional[int] = None, concurrency: Optional[int] = None):
+        # Warm up to `limit` URLs with at most `concurrency` loads/collections in flight
+        limit = limit or settings.warmup_limit
+        concurrency = concurrency or settings.warmup_concurrency
+        progress = self.progress
+        progress["started_at"] = datetime.utcnow().isoformat()
+
+        try:
+            await db.wait_connected()
+            selected = await self.select_urls(urls, limit)
+            progress["total"] = len(selected)
+            progress["state"] = "running"
+            logger.info("Warming up %d URLs from %s (concurrency %d)", len(selected), progress["source"], concurrency)
+
+            pending: asyncio.Queue = asyncio.Queue()
+            for url in selected:
+                pending.put_nowait(url)
+            report_every = max(1, len(selected) // 10)
+
+            async def worker():
+                while True:
+                    try:
+                        url = pending.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    try:
+                        await self.warm_url(url)
+                    except Exception as e:
+                        progress["failed"] += 1
+                        logger.error("Error warming up %s: %s", url, e, extra={"url": url})
+                    progress["processed"] += 1
+                    if progress["processed"] % report_every == 0:
+                        logger.info("Warm-up progress: %d/%d URLs", progress["processed"], progress["total"])
+
+            await asyncio.gather(*(worker() for _ in range(min(concurrency, len(selected)) or 1)))
+            progress["state"] = "done"
+            logger.info(
+                "Warm-up done: %d loaded, %d collected, %d cached, %d skipped, %d failed",
+                progress["loaded"], progress["collected"], progress["cached"], progress["skipped"], progress["failed"]
+            )
+
+        except asyncio.CancelledError:
+            progress["state"] = "cancelled"
+            raise
+        except Exception as e:
+            # A broken warm-up must not keep the service out of rotation
+            progress["state"] = "failed"
+            logger.error("Warm-up failed: %s", e, exc_info=True)
+        finally:
+            progress["finished_at"] = datetime.utcnow().isoformat()
+
+
+# Singleton instances, started from the application lifespan and the admin endpoints
+access_tracker = AccessTracker()
+warmer = CacheWarmer()
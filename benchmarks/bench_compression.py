@@ -0,0 +1,129 @@
+# Compressed passthrough benchmark: bytes sent and server CPU per GET /metadata request.
+#
+# Usage:
+#   python benchmarks/bench_compression.py [--requests 500] [--page page.html]
+#
+# Runs the ASGI app in-process with MetadataRepository.get_by_url served from memory,
+# so only serialization and compression are measured. The app is called directly
+# (no HTTP client), so response decoding does not count towards CPU time.
+# Compared modes:
+#   identity          - JSON serialized per request, uncompressed
+#   gzip on the fly   - the same behind Starlette's GZipMiddleware (compressing every response)
+#   stored gzip / br  - the precompressed response stored at ingest, sent as-is
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+from starlette.middleware.gzip import GZipMiddleware
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.encoding import ENCODINGS, compress  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import MetadataResponse  # noqa: E402
+
+URL = "https://example.com/page"
+
+
+def build_document(page_source: str, with_encodings: bool):
+    document = {
+        "url": URL,
+        "headers": {"content-type": "text/html; charset=utf-8", "server": "nginx"},
+        "cookies": {"session": "abc123"},
+        "page_source": page_source,
+        "page_source_length": len(page_source.encode("utf-8")),
+        "status": "completed",
+        "created_at": datetime(2024, 1, 1),
+        "updated_at": datetime(2024, 1, 1),
+    }
+    if with_encodings:
+        document["response_encodings"] = compress(MetadataResponse(**document).model_dump_json().encode("utf-8"))
+    return document
+
+
+async def call(asgi_app, accept_encoding: str) -> int:
+    # Issue one GET /metadata against the ASGI app and return the number of body bytes sent
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/metadata",
+        "raw_path": b"/metadata",
+        "root_path": "",
+        "query_string": f"url={URL}".encode(),
+        "headers": [(b"host", b"bench"), (b"accept-encoding", accept_encoding.encode())],
+        "server": ("bench", 80),
+        "client": ("127.0.0.1", 12345),
+    }
+    sent = 0
+    requested = False
+    finished = asyncio.Event()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal sent
+        if message["type"] == "http.response.body":
+            sent += len(message.get("body", b""))
+            if not message.get("more_body", False):
+                finished.set()
+
+    await asgi_app(scope, receive, send)
+    return sent
+
+
+async def run_mode(name, asgi_app, document, accept_encoding, requests):
+    async def get_by_url(url, response_encodings=(), fresh=False):
+        return dict(document)
+
+    with patch("app.main.MetadataRepository.get_by_url", side_effect=get_by_url):
+        for _ in range(10):
+            await call(asgi_app, accept_encoding)
+
+        cpu_start = time.process_time()
+        sent = 0
+        for _ in range(requests):
+            sent = await call(asgi_app, accept_encoding)
+        cpu = (time.process_time() - cpu_start) / requests
+
+    print(f"{name:<18} {sent:>10} bytes/request   {cpu * 1e6:>10.1f} us CPU/request")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compressed passthrough benchmark")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--page", help="HTML file to use as page source (default: ~200 KB synthetic page)")
+    args = parser.parse_args()
+
+    if args.page:
+        with open(args.page, encoding="utf-8", errors="replace") as page:
+            page_source = page.read()
+    else:
+        rows = "".join(f"<tr><td>item {i}</td><td>{i * 37 % 1000}</td><td>description {i % 97}</td></tr>" for i in range(3000))
+        page_source = f"<html><head><title>Inventory</title></head><body><table>{rows}</table></body></html>"
+
+    plain = build_document(page_source, with_encodings=False)
+    stored = build_document(page_source, with_encodings=True)
+    print(f"page source: {len(page_source.encode('utf-8'))} bytes, {args.requests} requests per mode\n")
+
+    await run_mode("identity", app, plain, "identity", args.requests)
+    await run_mode("gzip on the fly", GZipMiddleware(app, minimum_size=500), plain, "gzip", args.requests)
+    for encoding in reversed(ENCODINGS):
+        await run_mode(f"stored {encoding}", app, stored, encoding, args.requests)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,131 @@
+# Logging benchmark: request latency on the event loop with synchronous vs queue-backed logging.
+#
+# Usage:
+#   python benchmarks/bench_logging.py [--requests 2000] [--concurrency 100] [--write-latency-ms 1]
+#
+# Simulated requests run concurrently on one event loop and log what a cache miss logs
+# (per-URL INFO lines, plus an error with a traceback for 1 in 50). Log output goes to a
+# stream whose writes take --write-latency-ms, like stdout piped to a slow collector.
+# Compared modes:
+#   sync              - logging.basicConfig-style StreamHandler with f-string messages
+#   queue             - app.structured_logging pipeline (JSON, lazy args), rate limiting off
+#   queue + limit     - the same with the default per-URL rate limiting
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings  # noqa: E402
+from app.structured_logging import setup_logging, shutdown_logging  # noqa: E402
+
+logger = logging.getLogger("app.bench")
+
+
+class SlowStream:
+    # A text stream whose every write blocks for a while
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.lines = 0
+
+    def write(self, data: str):
+        time.sleep(self.latency)
+        self.lines += data.count("\n")
+
+    def flush(self):
+        pass
+
+
+async def request_sync(i: int):
+    url = f"https://example.com/{i}"
+    logger.info(f"Cache miss for {url}, triggering background collection")
+    await asyncio.sleep(0)
+    logger.info(f"Starting background collection for {url}")
+    await asyncio.sleep(0)
+    if i % 50 == 0:
+        try:
+            raise TimeoutError("timed out")
+        except TimeoutError as e:
+            logger.error(f"Error storing metadata: {e}", exc_info=True)
+    logger.info(f"Stored metadata for {url}")
+
+
+async def request_queue(i: int):
+    url = f"https://example.com/{i}"
+    logger.info("Cache miss for %s, triggering background collection", url, extra={"url": url})
+    await asyncio.sleep(0)
+    logger.info("Starting background collection for %s", url, extra={"url": url})
+    await asyncio.sleep(0)
+    if i % 50 == 0:
+        try:
+            raise TimeoutError("timed out")
+        except TimeoutError as e:
+            logger.error("Error storing metadata for %s: %s", url, e, exc_info=True, extra={"url": url})
+    logger.info("Stored metadata for %s", url, extra={"url": url})
+
+
+async def run(handler, requests: int, concurrency: int):
+    # Latency of every request, measured from when it was started to when it finished
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await handler(i)
+            latencies.append(time.perf_counter() - started)
+
+    wall = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return sorted(latencies), time.perf_counter() - wall
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--write-latency-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    modes = [("sync", None), ("queue", 10 ** 9), ("queue + limit", settings.log_rate_limit_burst)]
+    for name, burst in modes:
+        stream = SlowStream(args.write_latency_ms / 1000)
+        root = logging.getLogger()
+        if burst is None:
+            handler = logging.StreamHandler(stream)
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+            root.addHandler(handler)
+            root.setLevel(logging.INFO)
+            request = request_sync
+        else:
+            settings.log_rate_limit_burst = burst
+            setup_logging(stream=stream, level="INFO", log_format="json")
+            request = request_queue
+
+        latencies, wall = asyncio.run(run(request, args.requests, args.concurrency))
+
+        drain = time.perf_counter()
+        if burst is None:
+            root.removeHandler(handler)
+        else:
+            shutdown_logging()
+        drain = time.perf_counter() - drain
+
+        print(
+            f"{name:<15} p50 {percentile(latencies, 0.5) * 1000:8.2f} ms   "
+            f"p99 {percentile(latencies, 0.99) * 1000:8.2f} ms   "
+            f"wall {wall:6.2f} s   {stream.lines:6d} lines written   {drain:5.2f} s to drain"
+        )
+
+
+if __name__ == "__main__":
+    main()
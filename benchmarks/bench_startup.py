@@ -0,0 +1,86 @@
+# Startup-time benchmark: import time of app.main and time to first served request.
+#
+# Usage:
+#   python benchmarks/bench_startup.py [--runs 5] [--port 8765] [--path /live]
+#
+# Time to first served request is measured from spawning uvicorn until the first
+# 200 response on --path (/live by default, use /ready to include the MongoDB
+# connection and index build).
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def measure_import() -> float:
+    # Import app.main in a fresh interpreter and return the import time in seconds
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def measure_first_request(port: int, path: str, timeout: float) -> float:
+    # Spawn uvicorn and poll until the first 200 response, return the elapsed seconds
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        url = f"http://127.0.0.1:{port}{path}"
+        while time.perf_counter() - start < timeout:
+            try:
+                if httpx.get(url, timeout=0.5).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.TransportError:
+                pass
+            time.sleep(0.005)
+        raise TimeoutError(f"No 200 response from {url} within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def summarize(name: str, samples):
+    print(
+        f"{name:<24} median {statistics.median(samples) * 1000:8.1f} ms"
+        f"   min {min(samples) * 1000:8.1f} ms   max {max(samples) * 1000:8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup-time benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--path", default="/live")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    summarize("import app.main", [measure_import() for _ in range(args.runs)])
+    summarize(
+        f"first 200 on {args.path}",
+        [measure_first_request(args.port, args.path, args.timeout) for _ in range(args.runs)]
+    )
+
+
+if __name__ == "__main__":
+    main()
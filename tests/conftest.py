@@ -6,6 +6,8 @@ from httpx import AsyncClient, ASGITransport
 
 from app.main import app
 from app.database import db
+from app.notifier import notifier
+from app.resilience import circuit_breaker, negative_cache
 
 # Creating a test client.
 @pytest_asyncio.fixture(scope="function")
@@ -16,6 +18,11 @@ async def client() -> AsyncGenerator[AsyncClient, None]:
 
 @pytest_asyncio.fixture(scope="function", autouse=True)
 async def setup_database():
+    # Every test starts without backoffs, open breakers or in-flight collections left by earlier ones
+    negative_cache.reset()
+    circuit_breaker.reset()
+    notifier.reset()
+    
     # Connecting to test database
     try:
         await db.connect()
@@ -1,6 +1,13 @@
 import pytest
 from httpx import AsyncClient
 import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+from app.config import settings
+from app.database import db
+from app.models import MetadataStatus
+from app.repository import MetadataRepository
 
 # Testing health check and root endpoints.
 @pytest.mark.asyncio
@@ -13,6 +20,79 @@ class TestHealthEndpoints:
         data = response.json()
         assert data["status"] == "healthy"
         assert "service" in data
+    
+    async def test_live_endpoint(self, client: AsyncClient):
+        response = await client.get("/live")
+        
+        assert response.status_code == 200
+        assert response.json()["status"] == "alive"
+    
+    async def test_ready_endpoint(self, client: AsyncClient):
+        response = await client.get("/ready")
+        
+        assert response.status_code in [200, 503]
+        assert response.json()["status"] in ["ready", "not ready"]
+        assert response.json()["warmup"] == "warm"
+    
+    async def test_circuit_breaker_endpoint(self, client: AsyncClient):
+        response = await client.get("/circuit-breakers")
+        
+        assert response.status_code == 200
+        assert "hosts" in response.json()
+
+    async def test_fetch_stats_endpoint(self, client: AsyncClient):
+        response = await client.get("/stats/fetch")
+        
+        assert response.status_code == 200
+        assert "phases" in response.json()
+
+# Testing the profiling admin endpoints.
+@pytest.mark.asyncio
+class TestProfilingEndpoints:
+    
+    async def test_enable_and_disable_profiling(self, client: AsyncClient):
+        response = await client.put(
+            "/admin/profiling",
+            json={"enabled": True, "sample_rate": 1.0, "slow_threshold_ms": 0}
+        )
+        assert response.status_code == 200
+        assert response.json()["enabled"] is True
+        
+        await client.get("/")
+        
+        response = await client.get("/admin/profiling")
+        assert len(response.json()["profiles"]) > 0
+        
+        response = await client.put("/admin/profiling", json={"enabled": False})
+        assert response.json()["enabled"] is False
+    
+    async def test_invalid_sample_rate(self, client: AsyncClient):
+        response = await client.put(
+            "/admin/profiling",
+            json={"enabled": True, "sample_rate": 2}
+        )
+        assert response.status_code == 422
+
+# Testing the cache warm-up admin endpoints.
+@pytest.mark.asyncio
+class TestWarmupEndpoints:
+    
+    async def test_start_and_poll_warmup(self, client: AsyncClient):
+        response = await client.post("/admin/warmup", json={"urls": ["not a url"]})
+        assert response.status_code == 202
+        
+        for _ in range(100):
+            response = await client.get("/admin/warmup")
+            if response.json()["state"] == "done":
+                break
+            await asyncio.sleep(0.01)
+        
+        assert response.json()["state"] == "done"
+        assert response.json()["total"] == 0
+    
+    async def test_invalid_concurrency(self, client: AsyncClient):
+        response = await client.post("/admin/warmup", json={"concurrency": 0})
+        assert response.status_code == 422
 
 # Testing POST metadata endpoint.
 @pytest.mark.asyncio
@@ -121,6 +201,144 @@ class TestGetMetadataEndpoint:
         data = response2.json()
         assert data["status"] in ["completed", "failed"]
 
+    # A PENDING record should be reported with 202, not 200.
+    async def test_get_pending_record_returns_202(self, client: AsyncClient):
+        url = "https://pending-record-12345.com"
+        await MetadataRepository.create_pending(url)
+        
+        response = await client.get(f"/metadata?url={url}")
+        
+        assert response.status_code == 202
+        assert response.json()["status"] == "pending"
+    
+    # A PENDING record left behind by a stopped worker is collected again.
+    async def test_abandoned_pending_record_is_collected(self, client: AsyncClient):
+        url = "https://abandoned-pending-12345.com"
+        await MetadataRepository.create_pending(url)
+        abandoned_at = datetime.utcnow() - timedelta(seconds=settings.request_timeout + settings.pending_abandon_margin + 1)
+        await db.get_collection().update_one({"url": url}, {"$set": {"updated_at": abandoned_at}})
+        
+        collected = {"url": url, "headers": {}, "cookies": {}, "page_source": "<html></html>", "status": MetadataStatus.COMPLETED}
+        with patch("app.main.MetadataCollector.collect_metadata", AsyncMock(return_value=(collected, MetadataStatus.COMPLETED))):
+            response = await client.get(f"/metadata?url={url}&wait=5")
+        
+        assert response.status_code == 200
+        assert response.json()["status"] == "completed"
+    
+    # With wait, the request is held open until the collection finishes.
+    async def test_get_metadata_wait_returns_result(self, client: AsyncClient):
+        url = "https://httpbin.org/html"
+        
+        response = await client.get(f"/metadata?url={url}&wait=20")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["url"] == url
+        assert data["status"] in ["completed", "failed"]
+    
+    async def test_get_metadata_wait_out_of_range(self, client: AsyncClient):
+        response = await client.get("/metadata?url=https://example.com&wait=-1")
+        
+        assert response.status_code == 422
+
+# Test GET metadata/source endpoint.
+@pytest.mark.asyncio
+class TestGetMetadataSourceEndpoint:
+    
+    async def _store(self, url: str, page_source: str):
+        await MetadataRepository.create_or_update({
+            "url": url,
+            "headers": {"content-type": "text/html; charset=ISO-8859-1"},
+            "cookies": {},
+            "page_source": page_source,
+            "status": MetadataStatus.COMPLETED
+        })
+    
+    async def test_full_source(self, client: AsyncClient):
+        url = "https://source-test.com"
+        await self._store(url, "<html>hello</html>")
+        
+        response = await client.get(f"/metadata/source?url={url}")
+        
+        assert response.status_code == 200
+        assert response.text == "<html>hello</html>"
+        assert response.headers["accept-ranges"] == "bytes"
+        assert response.headers["content-type"] == "text/html; charset=utf-8"
+    
+    async def test_range_request(self, client: AsyncClient):
+        url = "https://source-range-test.com"
+        await self._store(url, "<html>hello</html>")
+        
+        response = await client.get(f"/metadata/source?url={url}", headers={"Range": "bytes=6-10"})
+        
+        assert response.status_code == 206
+        assert response.text == "hello"
+        assert response.headers["content-range"] == "bytes 6-10/18"
+    
+    async def test_if_range_with_old_etag_sends_full_body(self, client: AsyncClient):
+        url = "https://source-if-range-test.com"
+        await self._store(url, "<html>hello</html>")
+        etag = (await client.get(f"/metadata/source?url={url}")).headers["etag"]
+        
+        response = await client.get(f"/metadata/source?url={url}", headers={"Range": "bytes=6-10", "If-Range": etag})
+        assert response.status_code == 206
+        
+        await self._store(url, "<html>changed</html>")
+        response = await client.get(f"/metadata/source?url={url}", headers={"Range": "bytes=6-10", "If-Range": etag})
+        assert response.status_code == 200
+        assert response.text == "<html>changed</html>"
+        assert response.headers["etag"] != etag
+    
+    async def test_unsatisfiable_range(self, client: AsyncClient):
+        url = "https://source-416-test.com"
+        await self._store(url, "<html></html>")
+        
+        response = await client.get(f"/metadata/source?url={url}", headers={"Range": "bytes=100-"})
+        
+        assert response.status_code == 416
+        assert response.headers["content-range"] == "bytes */13"
+    
+    async def test_missing_source_returns_404(self, client: AsyncClient):
+        response = await client.get("/metadata/source?url=https://no-source-12345.com")
+        
+        assert response.status_code == 404
+
+# Test compressed passthrough of stored responses.
+@pytest.mark.asyncio
+class TestCompressedResponses:
+    
+    async def _store(self, url: str):
+        await MetadataRepository.create_or_update({
+            "url": url,
+            "headers": {"content-type": "text/html"},
+            "cookies": {},
+            "page_source": "<html>" + "<p>compress me</p>" * 200 + "</html>",
+            "status": MetadataStatus.COMPLETED
+        })
+    
+    async def test_get_metadata_gzip(self, client: AsyncClient):
+        url = "https://compressed-test.com"
+        await self._store(url)
+        
+        identity = await client.get(f"/metadata?url={url}", headers={"Accept-Encoding": "identity"})
+        compressed = await client.get(f"/metadata?url={url}", headers={"Accept-Encoding": "gzip"})
+        
+        assert compressed.status_code == 200
+        assert compressed.headers["content-encoding"] == "gzip"
+        assert "accept-encoding" in compressed.headers["vary"].lower()
+        assert "content-encoding" not in identity.headers
+        assert compressed.json() == identity.json()
+    
+    async def test_get_source_gzip(self, client: AsyncClient):
+        url = "https://compressed-source-test.com"
+        await self._store(url)
+        
+        response = await client.get(f"/metadata/source?url={url}", headers={"Accept-Encoding": "gzip"})
+        
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.text.startswith("<html><p>compress me</p>")
+
 # This test complete workflows.
 @pytest.mark.asyncio
 class TestWorkflowIntegration:
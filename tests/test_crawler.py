@@ -0,0 +1,121 @@
+import io
+import pytest
+from unittest.mock import patch
+from datetime import datetime
+
+from app.crawler import parse_line, read_urls, shard_for, load_checkpoint, checkpoint_path, crawl_shard, crawl
+from app.models import MetadataStatus
+from app.resilience import CircuitOpenError
+
+
+# Tests for reading crawler input.
+class TestCrawlerInput:
+    
+    def test_parse_plain_and_ndjson_lines(self):
+        assert parse_line("https://example.com\n") == "https://example.com"
+        assert parse_line('{"url": "https://example.com/a", "id": 1}') == "https://example.com/a"
+        assert parse_line('"https://example.com/b"') == "https://example.com/b"
+    
+    def test_skip_invalid_lines(self):
+        assert parse_line("") is None
+        assert parse_line("# comment") is None
+        assert parse_line("ftp://example.com") is None
+        assert parse_line('{"request_id": "x"}') is None
+        assert parse_line("{not json") is None
+    
+    def test_read_urls_deduplicates(self):
+        source = io.StringIO("https://a.com\n\nhttps://b.com\nhttps://a.com\n")
+        assert list(read_urls(source)) == ["https://a.com", "https://b.com"]
+    
+    def test_shard_by_host(self):
+        assert shard_for("https://a.com/x", 8) == shard_for("https://A.com/y?z=1", 8)
+        assert all(0 <= shard_for(f"https://host{i}.com", 4) < 4 for i in range(100))
+    
+    def test_load_checkpoint(self, tmp_path):
+        (tmp_path / "worker-0.done").write_text("https://a.com\nhttps://b.com\n")
+        (tmp_path / "worker-3.done").write_text("https://c.com\n")
+        
+        assert load_checkpoint(str(tmp_path)) == {"https://a.com", "https://b.com", "https://c.com"}
+        assert load_checkpoint(None) == set()
+
+
+def fake_metadata(url: str):
+    status = MetadataStatus.FAILED if "fail" in url else MetadataStatus.COMPLETED
+    return {"url": url, "status": status, "created_at": datetime.utcnow()}, status
+
+
+# Tests for crawling a shard.
+@pytest.mark.asyncio
+class TestCrawlShard:
+    
+    async def test_batches_and_checkpoints(self, tmp_path):
+        urls = [f"https://example.com/{i}" for i in range(7)] + ["https://example.com/fail"]
+        batches = []
+        
+        async def collect(url):
+            return fake_metadata(url)
+        
+        async def bulk_store(records):
+            batches.append([record["url"] for record in records])
+            return True
+        
+        with patch("app.crawler.MetadataCollector.collect_metadata", side_effect=collect), \
+                patch("app.crawler.MetadataRepository.bulk_create_or_update", side_effect=bulk_store):
+            with open(checkpoint_path(str(tmp_path), 0), "a") as checkpoint:
+                totals = await crawl_shard(0, urls, concurrency=3, batch_size=3, checkpoint_file=checkpoint)
+        
+        assert totals == {"done": 8, "failed": 1, "write_errors": 0, "skipped": 0}
+        assert all(len(batch) <= 3 for batch in batches)
+        assert sorted(url for batch in batches for url in batch) == sorted(urls)
+        # The failed URL is retried on resume
+        assert load_checkpoint(str(tmp_path)) == set(urls) - {"https://example.com/fail"}
+    
+    async def test_failed_writes_are_not_checkpointed(self, tmp_path):
+        async def collect(url):
+            return fake_metadata(url)
+        
+        async def bulk_store(records):
+            return False
+        
+        with patch("app.crawler.MetadataCollector.collect_metadata", side_effect=collect), \
+                patch("app.crawler.MetadataRepository.bulk_create_or_update", side_effect=bulk_store):
+            with open(checkpoint_path(str(tmp_path), 0), "a") as checkpoint:
+                totals = await crawl_shard(0, ["https://a.com"], concurrency=1, batch_size=10, checkpoint_file=checkpoint)
+        
+        assert totals["write_errors"] == 1
+        assert load_checkpoint(str(tmp_path)) == set()
+    
+    async def test_short_circuited_urls_are_not_stored(self, tmp_path):
+        async def collect(url):
+            if "down" in url:
+                raise CircuitOpenError("down.com", "ConnectTimeout")
+            return fake_metadata(url)
+        
+        stored = []
+        
+        async def bulk_store(records):
+            stored.extend(record["url"] for record in records)
+            return True
+        
+        with patch("app.crawler.MetadataCollector.collect_metadata", side_effect=collect), \
+                patch("app.crawler.MetadataRepository.bulk_create_or_update", side_effect=bulk_store):
+            with open(checkpoint_path(str(tmp_path), 0), "a") as checkpoint:
+                totals = await crawl_shard(0, ["https://a.com", "https://down.com/1"], concurrency=1, batch_size=10, checkpoint_file=checkpoint)
+        
+        assert totals["skipped"] == 1
+        assert stored == ["https://a.com"]
+        assert load_checkpoint(str(tmp_path)) == {"https://a.com"}
+
+
+# Tests for resuming a crawl.
+class TestCrawlResume:
+    
+    def test_everything_checkpointed_means_nothing_to_do(self, tmp_path):
+        (tmp_path / "worker-0.done").write_text("https://a.com\nhttps://b.com\n")
+        out = io.StringIO()
+        
+        exit_code = crawl(["https://a.com", "https://b.com"], 2, 1, 10, str(tmp_path), 1.0, out=out)
+        
+        assert exit_code == 0
+        assert "Skipping 2 URLs" in out.getvalue()
+        assert "Nothing to crawl" in out.getvalue()
@@ -0,0 +1,89 @@
+import pytest
+
+from app.config import settings
+from app.database import Database, Route, backoff_delay, parse_write_concern
+
+
+# Tests for the connection backoff.
+class TestBackoff:
+    
+    def test_delay_is_jittered_within_bounds(self):
+        for attempt in range(10):
+            cap = min(5.0, 0.1 * (2 ** attempt))
+            delays = [backoff_delay(attempt, 0.1, 5.0) for _ in range(50)]
+            assert all(0 <= d <= cap for d in delays)
+            assert len(set(delays)) > 1
+    
+    def test_delay_is_capped(self):
+        assert backoff_delay(30, 0.1, 2.0) <= 2.0
+
+
+# Tests for connecting and readiness.
+@pytest.mark.asyncio
+class TestDatabaseConnect:
+    
+    async def test_connect_gives_up_after_retries(self, monkeypatch):
+        # Nothing listens on port 1, every attempt fails fast
+        monkeypatch.setattr(settings, "mongodb_url", "mongodb://127.0.0.1:1")
+        monkeypatch.setattr(settings, "db_server_selection_timeout_ms", 50)
+        monkeypatch.setattr(settings, "db_retry_base_delay", 0.01)
+        
+        with pytest.raises(Exception):
+            await Database.connect(max_retries=2)
+        
+        assert Database.is_ready() is False
+        await Database.disconnect()
+    
+    async def test_not_ready_until_indexes_built(self):
+        Database.connected = True
+        Database.indexes_ready = False
+        assert Database.is_ready() is False
+        
+        Database.indexes_ready = True
+        assert Database.is_ready() is True
+        
+        await Database.disconnect()
+        assert Database.is_ready() is False
+
+
+# Tests for per-operation read/write routing.
+def test_parse_write_concern():
+    assert parse_write_concern("1") == 1
+    assert parse_write_concern("majority") == "majority"
+
+
+@pytest.mark.asyncio
+class TestRouting:
+    
+    async def test_routes_use_their_own_options(self, monkeypatch):
+        monkeypatch.setattr(settings, "read_preference", "secondaryPreferred")
+        monkeypatch.setattr(settings, "read_max_staleness_seconds", 120)
+        monkeypatch.setattr(settings, "read_pool_size", 7)
+        monkeypatch.setattr(settings, "write_pool_size", 3)
+        Database.create_clients()
+        
+        try:
+            hot = Database.get_collection(Route.HOT_READ)
+            assert hot.read_preference.mongos_mode == "secondaryPreferred"
+            assert hot.read_preference.max_staleness == 120
+            
+            primary = Database.get_collection()
+            assert primary.read_preference.mongos_mode == "primary"
+            assert primary.write_concern.document == {"w": "majority"}
+            
+            pending = Database.get_collection(Route.PENDING)
+            assert pending.write_concern.document == {"w": 1}
+            
+            assert Database.read_client.options.pool_options.max_pool_size == 7
+            assert Database.client.options.pool_options.max_pool_size == 3
+            assert Database.reads_from_secondaries() is True
+        finally:
+            await Database.disconnect()
+    
+    async def test_primary_reads_by_default(self):
+        Database.create_clients()
+        try:
+            assert Database.get_collection(Route.HOT_READ).read_preference.mongos_mode == "primary"
+            assert Database.reads_from_secondaries() is False
+        finally:
+            await Database.disconnect()
@@ -0,0 +1,82 @@
+import gzip
+import pytest
+
+from app.encoding import ENCODINGS, acceptable_encodings, brotli, compress
+from app.models import MetadataStatus
+from app.repository import MetadataRepository
+
+
+PAGE = ("<html><body>" + "<p>Hello inventory</p>" * 500 + "</body></html>").encode("utf-8")
+
+
+# Tests for precompression at ingest.
+class TestCompress:
+    
+    def test_compress_round_trip(self):
+        encoded = compress(PAGE)
+        
+        assert set(encoded) == set(ENCODINGS)
+        assert gzip.decompress(encoded["gzip"]) == PAGE
+        if brotli is not None:
+            assert brotli.decompress(encoded["br"]) == PAGE
+    
+    def test_small_bodies_are_not_compressed(self):
+        assert compress(b"<html></html>") == {}
+    
+    def test_gzip_is_deterministic(self):
+        assert compress(PAGE)["gzip"] == compress(PAGE)["gzip"]
+
+
+# Tests for Accept-Encoding negotiation.
+class TestAcceptableEncodings:
+    
+    def test_no_header_means_identity(self):
+        assert acceptable_encodings(None) == []
+        assert acceptable_encodings("identity") == []
+    
+    def test_server_preference_on_equal_weight(self):
+        assert acceptable_encodings("gzip, deflate, br") == ["br", "gzip"]
+    
+    def test_q_values(self):
+        assert acceptable_encodings("br;q=0.5, gzip") == ["gzip", "br"]
+        assert acceptable_encodings("br;q=0, gzip") == ["gzip"]
+    
+    def test_wildcard(self):
+        assert acceptable_encodings("*") == ["br", "gzip"]
+        assert acceptable_encodings("*, br;q=0") == ["gzip"]
+    
+    def test_only_available_encodings(self):
+        assert acceptable_encodings("br, gzip", available=["gzip"]) == ["gzip"]
+
+
+# Tests for building the stored record.
+@pytest.mark.asyncio
+class TestPrepareUpdate:
+    
+    async def test_page_source_is_precompressed(self):
+        update, new_file_ids = await MetadataRepository.prepare_update({
+            "url": "https://example.com",
+            "page_source": PAGE.decode("utf-8"),
+            "status": MetadataStatus.COMPLETED
+        })
+        
+        stored = update["$set"]
+        assert new_file_ids == []
+        assert stored["page_source_length"] == len(PAGE)
+        assert stored["response_encodings"] == {}
+        body = stored["page_source_encodings"]["gzip"]
+        assert body["file_id"] is None
+        assert body["length"] == len(body["data"])
+        assert gzip.decompress(body["data"]) == PAGE
+    
+    async def test_failed_record_clears_page_source(self):
+        update, _ = await MetadataRepository.prepare_update({
+            "url": "https://example.com",
+            "page_source": None,
+            "status": MetadataStatus.FAILED
+        })
+        
+        stored = update["$set"]
+        assert stored["page_source_encodings"] == {}
+        assert stored["page_source_file_id"] is None
+        assert stored["page_source_length"] is None
@@ -1,6 +1,10 @@
 import pytest
+from unittest.mock import AsyncMock, patch
 from httpx import AsyncClient
 
+from app.config import settings
+from app.resilience import circuit_breaker
+
 # It tests error handling scenarios.
 @pytest.mark.asyncio
 class TestErrorHandling:    
@@ -30,4 +34,29 @@ class TestErrorHandling:
         # It should still return 201 but mark as failed
         assert response.status_code == 201
         data = response.json()
-        assert data["status"] == "failed"
\ No newline at end of file
+        assert data["status"] == "failed"
+    
+    async def test_failed_url_is_not_refetched(self, client: AsyncClient):
+        # A recently failed URL should back off instead of being fetched again.
+        url = "https://this-domain-does-not-exist-67890.com"
+        
+        response1 = await client.post("/metadata", json={"url": url})
+        assert response1.json()["status"] == "failed"
+        
+        response2 = await client.post("/metadata", json={"url": url})
+        assert response2.status_code == 503
+        assert 1 <= int(response2.headers["Retry-After"]) <= settings.negative_cache_base_ttl
+        assert "retry deferred" in response2.json()["detail"]
+    
+    async def test_open_breaker_keeps_stored_record(self, client: AsyncClient):
+        # A short-circuited fetch must not overwrite what is stored for the URL.
+        for _ in range(settings.breaker_failure_threshold):
+            circuit_breaker.record_failure("down.example.com", "ConnectTimeout")
+        
+        with patch("app.main.MetadataRepository.create_or_update", AsyncMock(return_value=True)) as store:
+            response = await client.post("/metadata", json={"url": "https://down.example.com/page"})
+        
+        assert response.status_code == 503
+        assert int(response.headers["Retry-After"]) >= 1
+        assert "ConnectTimeout" in response.json()["detail"]
+        store.assert_not_called()
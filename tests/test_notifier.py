@@ -0,0 +1,53 @@
+import pytest
+import asyncio
+
+from app.notifier import CollectionNotifier
+
+# Tests for the in-process collection notifier.
+@pytest.mark.asyncio
+class TestCollectionNotifier:
+    
+    async def test_start_only_once_per_url(self):
+        notifier = CollectionNotifier()
+        
+        assert notifier.start("https://example.com") is True
+        assert notifier.start("https://example.com") is False
+        assert notifier.is_in_flight("https://example.com")
+        
+        notifier.finish("https://example.com")
+        assert not notifier.is_in_flight("https://example.com")
+        assert notifier.start("https://example.com") is True
+    
+    async def test_waiters_are_woken_on_finish(self):
+        notifier = CollectionNotifier()
+        notifier.start("https://example.com")
+        
+        waiters = [
+            asyncio.create_task(notifier.wait("https://example.com", timeout=5))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0)
+        notifier.finish("https://example.com")
+        
+        assert await asyncio.gather(*waiters) == [True, True, True]
+    
+    async def test_wait_times_out(self):
+        notifier = CollectionNotifier()
+        notifier.start("https://example.com")
+        
+        assert await notifier.wait("https://example.com", timeout=0.01) is False
+    
+    async def test_wait_without_collection_returns_immediately(self):
+        notifier = CollectionNotifier()
+        
+        assert await notifier.wait("https://example.com", timeout=5) is False
+    
+    async def test_reset_forgets_collections(self):
+        notifier = CollectionNotifier()
+        notifier.start("https://example.com")
+        waiter = asyncio.create_task(notifier.wait("https://example.com", timeout=5))
+        await asyncio.sleep(0)
+        
+        notifier.reset()
+        assert await waiter is True
+        assert not notifier.is_in_flight("https://example.com")
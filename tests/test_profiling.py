@@ -0,0 +1,96 @@
+import time
+import asyncio
+from unittest.mock import patch
+
+from app.config import settings
+from app.profiling import SamplingProfiler, ProfilingMiddleware, fold_stack, profiler
+
+
+def busy_wait(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+# Tests for the sampling profiler.
+class TestSamplingProfiler:
+    
+    def test_disabled_profiler_does_not_sample(self):
+        profiler = SamplingProfiler()
+        
+        token = profiler.begin()
+        profiler.end(token, "GET", "/metadata")
+        
+        assert token is None
+        assert list(profiler.profiles) == []
+    
+    def test_slow_request_is_captured(self, monkeypatch):
+        monkeypatch.setattr(settings, "profiling_sample_interval", 0.001)
+        profiler = SamplingProfiler()
+        profiler.configure(enabled=True, sample_rate=1.0, slow_threshold_ms=10)
+        
+        try:
+            token = profiler.begin()
+            busy_wait(0.1)
+            profiler.end(token, "GET", "/metadata")
+        finally:
+            profiler.configure(enabled=False, sample_rate=1.0, slow_threshold_ms=10)
+        
+        profile = profiler.status()["profiles"][0]
+        assert profile["path"] == "/metadata"
+        assert profile["duration_ms"] >= 100
+        assert profile["samples"] > 0
+        assert any("busy_wait" in line for line in profiler.folded())
+    
+    def test_fast_request_is_discarded(self):
+        profiler = SamplingProfiler()
+        profiler.configure(enabled=True, sample_rate=1.0, slow_threshold_ms=10000)
+        
+        try:
+            token = profiler.begin()
+            profiler.end(token, "GET", "/metadata")
+        finally:
+            profiler.configure(enabled=False, sample_rate=1.0, slow_threshold_ms=10000)
+        
+        assert list(profiler.profiles) == []
+    
+    def test_fold_stack_is_root_first(self):
+        import sys
+        folded = fold_stack(sys._getframe())
+        
+        assert folded.endswith("test_profiling.py:test_fold_stack_is_root_first")
+
+
+# Tests for the ASGI middleware.
+class TestProfilingMiddleware:
+    
+    def _call(self, middleware):
+        scope = {"type": "http", "method": "GET", "path": "/live"}
+        asyncio.run(middleware(scope, None, None))
+    
+    def test_passes_through_when_disabled(self):
+        calls = []
+        
+        async def app(scope, receive, send):
+            calls.append(scope["path"])
+        
+        with patch.object(profiler, "begin") as begin:
+            self._call(ProfilingMiddleware(app))
+        
+        assert calls == ["/live"]
+        begin.assert_not_called()
+    
+    def test_slow_requests_are_profiled_when_enabled(self, monkeypatch):
+        monkeypatch.setattr(settings, "profiling_sample_interval", 0.001)
+        
+        async def app(scope, receive, send):
+            time.sleep(0.05)
+        
+        profiler.profiles.clear()
+        profiler.configure(True, 1.0, 0)
+        try:
+            self._call(ProfilingMiddleware(app))
+        finally:
+            profiler.configure(False, 0.1, 500)
+        
+        assert profiler.profiles[-1]["path"] == "/live"
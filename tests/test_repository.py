@@ -1,6 +1,7 @@
 import pytest
 from datetime import datetime
 
+from app.database import db
 from app.repository import MetadataRepository
 from app.models import MetadataStatus
 
@@ -75,4 +76,86 @@ class TestMetadataRepository:
         
         retrieved = await MetadataRepository.get_by_url(url)
         assert "new content" in retrieved["page_source"]
-        assert retrieved["headers"]["new"] == "header"
\ No newline at end of file
+        assert retrieved["headers"]["new"] == "header"
+    
+    async def test_large_page_source_goes_to_gridfs(self, monkeypatch):
+        # Page sources above the threshold are stored in GridFS and streamed back.
+        monkeypatch.setattr("app.repository.settings.gridfs_threshold_bytes", 100)
+        url = "https://large-page-test.com"
+        page_source = "<html>" + "x" * 1000 + "</html>"
+        
+        metadata = {
+            "url": url,
+            "headers": {"content-type": "text/html"},
+            "cookies": {},
+            "page_source": page_source,
+            "status": MetadataStatus.COMPLETED,
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow()
+        }
+        assert await MetadataRepository.create_or_update(metadata) is True
+        
+        retrieved = await MetadataRepository.get_by_url(url)
+        assert retrieved["page_source"] is None
+        assert retrieved["page_source_length"] == len(page_source)
+        
+        document = await MetadataRepository.get_page_source(url)
+        assert document["page_source_file_id"] is not None
+        chunks = [chunk async for chunk in MetadataRepository.stream_page_source(document, 6, 15)]
+        assert b"".join(chunks) == b"x" * 10
+    
+    async def test_replacing_large_page_source_retires_gridfs_file(self, monkeypatch):
+        monkeypatch.setattr("app.repository.settings.gridfs_threshold_bytes", 100)
+        url = "https://large-page-replace.com"
+        
+        metadata = {
+            "url": url,
+            "headers": {},
+            "cookies": {},
+            "page_source": "y" * 1000,
+            "status": MetadataStatus.COMPLETED
+        }
+        await MetadataRepository.create_or_update(metadata)
+        
+        old_document = await MetadataRepository.get_page_source(url)
+        old_file_id = old_document["page_source_file_id"]
+        
+        await MetadataRepository.create_or_update({**metadata, "page_source": "small"})
+        
+        document = await MetadataRepository.get_page_source(url)
+        assert document["page_source"] == "small"
+        assert document["page_source_file_id"] is None
+        
+        # A stream that read the old document still gets the whole old body
+        chunks = [chunk async for chunk in MetadataRepository.stream_page_source(old_document, 0, 999)]
+        assert b"".join(chunks) == b"y" * 1000
+        
+        # Nothing is purged within the grace period, everything after it
+        assert await MetadataRepository.purge_retired_files() == 0
+        monkeypatch.setattr("app.repository.settings.gridfs_retire_grace", 0)
+        assert await MetadataRepository.purge_retired_files() >= 1
+        assert await db.get_gridfs_bucket().find({"_id": old_file_id}).to_list(None) == []
+    
+    async def test_bulk_create_or_update_stores_response_encodings(self):
+        urls = ["https://bulk-encoded-1.com", "https://bulk-encoded-2.com"]
+        records = [
+            {"url": url, "headers": {}, "cookies": {}, "page_source": "<p>hello</p>" * 500, "status": MetadataStatus.COMPLETED}
+            for url in urls
+        ]
+        assert await MetadataRepository.bulk_create_or_update(records) is True
+        
+        for url in urls:
+            document = await MetadataRepository.get_by_url(url, response_encodings=("gzip",), fresh=True)
+            assert document["response_encodings"]["gzip"]
+            # The page source is already part of the stored encoding
+            assert "page_source" not in document
+    
+    async def test_get_by_url_reads_page_source_without_stored_encoding(self):
+        url = "https://small-unencoded.com"
+        await MetadataRepository.create_or_update(
+            {"url": url, "headers": {}, "cookies": {}, "page_source": "tiny", "status": MetadataStatus.COMPLETED}
+        )
+        
+        document = await MetadataRepository.get_by_url(url, response_encodings=("gzip",), fresh=True)
+        assert not document["response_encodings"]
+        assert document["page_source"] == "tiny"
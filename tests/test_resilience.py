@@ -0,0 +1,210 @@
+import pytest
+from unittest.mock import MagicMock, patch
+import httpx
+
+from app.collector import MetadataCollector
+from app.config import settings
+from app.resilience import NegativeCache, CircuitBreaker, CircuitOpenError, circuit_breaker, negative_cache
+
+
+@pytest.fixture(autouse=True)
+def reset_resilience_state():
+    circuit_breaker.reset()
+    negative_cache.reset()
+    yield
+    circuit_breaker.reset()
+    negative_cache.reset()
+
+
+# Tests for the negative cache backoff.
+class TestNegativeCache:
+
+    def test_backoff_doubles_for_same_error_type(self, monkeypatch):
+        monkeypatch.setattr(settings, "negative_cache_base_ttl", 10)
+        monkeypatch.setattr(settings, "negative_cache_max_ttl", 100)
+        cache = NegativeCache()
+
+        assert cache.record_failure("https://a.com", "ConnectError") == 10
+        assert cache.record_failure("https://a.com", "ConnectError") == 20
+        assert cache.record_failure("https://a.com", "ConnectError") == 40
+        assert cache.record_failure("https://a.com", "ConnectError") == 80
+        assert cache.record_failure("https://a.com", "ConnectError") == 100
+
+    def test_backoff_restarts_when_error_type_changes(self, monkeypatch):
+        monkeypatch.setattr(settings, "negative_cache_base_ttl", 10)
+        cache = NegativeCache()
+
+        cache.record_failure("https://a.com", "ConnectError")
+        cache.record_failure("https://a.com", "ConnectError")
+        assert cache.record_failure("https://a.com", "HTTPStatusError") == 10
+        assert cache.get("https://a.com")["error_type"] == "HTTPStatusError"
+
+    def test_entry_expires(self):
+        cache = NegativeCache()
+        with patch("app.resilience.time.monotonic", return_value=1000.0):
+            cache.record_failure("https://a.com", "ReadTimeout")
+            assert cache.get("https://a.com") is not None
+
+        with patch("app.resilience.time.monotonic", return_value=1000.0 + settings.negative_cache_base_ttl):
+            assert cache.get("https://a.com") is None
+
+    def test_success_clears_entry(self):
+        cache = NegativeCache()
+        cache.record_failure("https://a.com", "ReadTimeout")
+        cache.record_success("https://a.com")
+        assert cache.get("https://a.com") is None
+
+    def test_long_expired_entry_is_evicted(self, monkeypatch):
+        monkeypatch.setattr(settings, "negative_cache_base_ttl", 10)
+        monkeypatch.setattr(settings, "negative_cache_max_ttl", 100)
+        cache = NegativeCache()
+        with patch("app.resilience.time.monotonic", return_value=1000.0):
+            cache.record_failure("https://a.com", "ReadTimeout")
+
+        # Expired but still remembered, the next failure keeps doubling
+        with patch("app.resilience.time.monotonic", return_value=1050.0):
+            assert cache.get("https://a.com") is None
+            assert len(cache) == 1
+
+        with patch("app.resilience.time.monotonic", return_value=1110.0):
+            assert cache.get("https://a.com") is None
+            assert len(cache) == 0
+
+    def test_size_is_capped(self, monkeypatch):
+        monkeypatch.setattr(settings, "negative_cache_max_entries", 100)
+        cache = NegativeCache()
+        for i in range(1000):
+            cache.record_failure(f"https://{i}.com", "ConnectError")
+
+        assert len(cache) <= 100
+        assert cache.get("https://999.com") is not None
+        assert cache.get("https://0.com") is None
+
+
+# Tests for the per-host circuit breaker.
+class TestCircuitBreaker:
+
+    def test_opens_after_threshold(self, monkeypatch):
+        monkeypatch.setattr(settings, "breaker_failure_threshold", 3)
+        breaker = CircuitBreaker()
+
+        for _ in range(2):
+            breaker.record_failure("slow.com", "ReadTimeout")
+        assert breaker.allow("slow.com") is True
+
+        breaker.record_failure("slow.com", "ReadTimeout")
+        assert breaker.allow("slow.com") is False
+        assert breaker.snapshot()["slow.com"]["state"] == "open"
+
+    def test_http_errors_do_not_count(self, monkeypatch):
+        monkeypatch.setattr(settings, "breaker_failure_threshold", 1)
+        breaker = CircuitBreaker()
+
+        breaker.record_failure("notfound.com", "HTTPStatusError")
+        assert breaker.allow("notfound.com") is True
+        assert "notfound.com" not in breaker.snapshot()
+
+    def test_host_table_is_capped(self, monkeypatch):
+        monkeypatch.setattr(settings, "breaker_max_hosts", 50)
+        breaker = CircuitBreaker()
+        for i in range(500):
+            breaker.record_failure(f"host-{i}.com", "ConnectError")
+
+        assert len(breaker) <= 50
+        assert "host-499.com" in breaker.snapshot()
+
+    def test_half_open_allows_single_trial(self, monkeypatch):
+        monkeypatch.setattr(settings, "breaker_failure_threshold", 1)
+        breaker = CircuitBreaker()
+
+        with patch("app.resilience.time.monotonic", return_value=1000.0):
+            breaker.record_failure("slow.com", "ConnectTimeout")
+
+        with patch("app.resilience.time.monotonic", return_value=1000.0 + settings.breaker_reset_timeout):
+            assert breaker.allow("slow.com") is True
+            assert breaker.allow("slow.com") is False
+            assert breaker.snapshot()["slow.com"]["state"] == "half_open"
+
+            breaker.record_success("slow.com")
+            assert breaker.allow("slow.com") is True
+
+    def test_abandoned_trial_expires(self, monkeypatch):
+        monkeypatch.setattr(settings, "breaker_failure_threshold", 1)
+        breaker = CircuitBreaker()
+
+        with patch("app.resilience.time.monotonic", return_value=1000.0):
+            breaker.record_failure("slow.com", "ConnectTimeout")
+
+        trial_at = 1000.0 + settings.breaker_reset_timeout
+        with patch("app.resilience.time.monotonic", return_value=trial_at):
+            assert breaker.allow("slow.com") is True
+
+        # The trial never reported back (cancelled), another one is allowed after the request timeout
+        with patch("app.resilience.time.monotonic", return_value=trial_at + 1):
+            assert breaker.allow("slow.com") is False
+        with patch("app.resilience.time.monotonic", return_value=trial_at + settings.request_timeout):
+            assert breaker.allow("slow.com") is True
+
+    def test_half_open_failure_reopens(self, monkeypatch):
+        monkeypatch.setattr(settings, "breaker_failure_threshold", 1)
+        breaker = CircuitBreaker()
+
+        with patch("app.resilience.time.monotonic", return_value=1000.0):
+            breaker.record_failure("slow.com", "ConnectTimeout")
+
+        with patch("app.resilience.time.monotonic", return_value=1000.0 + settings.breaker_reset_timeout):
+            assert breaker.allow("slow.com") is True
+            breaker.record_failure("slow.com", "ConnectTimeout")
+            assert breaker.allow("slow.com") is False
+
+
+# Tests for the collector integration.
+@pytest.mark.asyncio
+class TestCollectorResilience:
+
+    async def test_open_circuit_skips_network_call(self, monkeypatch):
+        monkeypatch.setattr(settings, "breaker_failure_threshold", 2)
+
+        with patch("httpx.AsyncClient.get", side_effect=httpx.ConnectTimeout("Timeout")) as mock_get:
+            await MetadataCollector.collect_metadata("https://slow-site.com/a")
+            await MetadataCollector.collect_metadata("https://slow-site.com/b")
+            with pytest.raises(CircuitOpenError) as error:
+                await MetadataCollector.collect_metadata("https://slow-site.com/c")
+
+            assert mock_get.call_count == 2
+            assert error.value.error_type == "ConnectTimeout"
+
+    async def test_short_circuit_keeps_backoff_growing(self, monkeypatch):
+        monkeypatch.setattr(settings, "breaker_failure_threshold", 1)
+        monkeypatch.setattr(settings, "negative_cache_base_ttl", 10)
+        url = "https://down-site.com"
+
+        with patch("httpx.AsyncClient.get", side_effect=httpx.ConnectError("Connection failed")):
+            await MetadataCollector.collect_metadata(url)
+            for _ in range(2):
+                with pytest.raises(CircuitOpenError):
+                    await MetadataCollector.collect_metadata(url)
+
+        entry = negative_cache.get(url)
+        assert entry["error_type"] == "ConnectError"
+        assert entry["failures"] == 3
+
+    async def test_failure_populates_negative_cache(self):
+        with patch("httpx.AsyncClient.get", side_effect=httpx.ConnectError("Connection failed")):
+            await MetadataCollector.collect_metadata("https://invalid-url.com")
+
+        assert negative_cache.get("https://invalid-url.com")["error_type"] == "ConnectError"
+
+    async def test_success_clears_negative_cache(self):
+        negative_cache.record_failure("https://example.com", "ReadTimeout")
+
+        mock_response = MagicMock(spec=httpx.Response)
+        mock_response.headers = {"content-type": "text/html"}
+        mock_response.cookies = {}
+        mock_response.text = "<html></html>"
+        mock_response.raise_for_status = MagicMock()
+
+        with patch("httpx.AsyncClient.get", return_value=mock_response):
+            await MetadataCollector.collect_metadata("https://example.com")
+
+        assert negative_cache.get("https://example.com") is None
@@ -0,0 +1,82 @@
+import os
+import asyncio
+
+import pytest
+import pytest_asyncio
+from datetime import datetime
+
+from app.config import settings
+from app.database import db, Route
+from app.repository import MetadataRepository
+from app.models import MetadataStatus
+
+
+# Integration tests for read/write routing, they need a replica set (see docker-compose.replset.yml)
+REPLSET_URL = os.environ.get("MONGODB_REPLSET_URL")
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.integration,
+    pytest.mark.skipif(not REPLSET_URL, reason="MONGODB_REPLSET_URL is not set"),
+]
+
+
+@pytest_asyncio.fixture
+async def replica_set(monkeypatch):
+    # Reconnect to the replica set with hot reads pinned to secondaries
+    await db.disconnect()
+    monkeypatch.setattr(settings, "mongodb_url", REPLSET_URL)
+    monkeypatch.setattr(settings, "read_preference", "secondary")
+    monkeypatch.setattr(settings, "read_max_staleness_seconds", 90)
+    await db.connect()
+    
+    yield
+    
+    await db.get_collection().delete_many({})
+    await db.disconnect()
+
+
+async def read_from_secondary(url: str, timeout: float = 5.0):
+    # Poll the hot read route until the record is replicated
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        document = await MetadataRepository.get_by_url(url)
+        if document is not None or asyncio.get_running_loop().time() > deadline:
+            return document
+        await asyncio.sleep(0.1)
+
+
+class TestReplicaSetRouting:
+    
+    async def test_hot_reads_are_served_by_secondaries(self, replica_set):
+        url = "https://routing-secondary.com"
+        assert await MetadataRepository.create_or_update({
+            "url": url,
+            "headers": {},
+            "cookies": {},
+            "page_source": "<html>Routed</html>",
+            "status": MetadataStatus.COMPLETED,
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow()
+        })
+        
+        # With the "secondary" read preference the read fails unless a secondary answers it
+        document = await read_from_secondary(url)
+        assert document is not None
+        assert document["status"] == "completed"
+    
+    async def test_fresh_reads_see_pending_writes(self, replica_set):
+        url = "https://routing-pending.com"
+        assert await MetadataRepository.create_pending(url)
+        
+        document = await MetadataRepository.get_by_url(url, fresh=True)
+        assert document is not None
+        assert document["status"] == "pending"
+    
+    async def test_routes_have_separate_pools(self, replica_set):
+        primary = db.get_collection(Route.PRIMARY)
+        hot = db.get_collection(Route.HOT_READ)
+        
+        assert primary.database.client is not hot.database.client
+        assert hot.read_preference.mongos_mode == "secondary"
+        assert db.get_collection(Route.PENDING).write_concern.document == {"w": 1}
@@ -0,0 +1,146 @@
+import multiprocessing
+import pytest
+from unittest.mock import patch
+
+from app.config import settings
+from app.shared_cache import SharedMetadataCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    shared = SharedMetadataCache()
+    shared.open(path=str(tmp_path / "cache"), slots=16, slot_size=256)
+    yield shared
+    shared.close()
+
+
+def put_from_other_process(path: str, url: str, payload: bytes):
+    other = SharedMetadataCache()
+    other.open(path=path, slots=16, slot_size=256)
+    assert other.put(url, payload, other.generation(url))
+    other.close()
+
+
+def invalidate_from_other_process(path: str, url: str):
+    other = SharedMetadataCache()
+    other.open(path=path, slots=16, slot_size=256)
+    other.invalidate(url)
+    other.close()
+
+
+# Tests for the shared memory-mapped metadata cache.
+class TestSharedMetadataCache:
+    
+    def test_put_and_get(self, cache):
+        url = "https://example.com"
+        assert cache.get(url) is None
+        
+        assert cache.put(url, b'{"url": "https://example.com"}', cache.generation(url)) is True
+        assert cache.get(url) == b'{"url": "https://example.com"}'
+    
+    def test_invalidate(self, cache):
+        url = "https://example.com"
+        cache.put(url, b"old", cache.generation(url))
+        
+        cache.invalidate(url)
+        
+        assert cache.get(url) is None
+    
+    def test_stale_put_after_invalidation_is_rejected(self, cache):
+        url = "https://example.com"
+        generation = cache.generation(url)
+        
+        # Another worker updates the record while we were reading it from the db
+        cache.invalidate(url)
+        
+        assert cache.put(url, b"stale", generation) is False
+        assert cache.get(url) is None
+    
+    def test_oversized_payload_is_not_cached(self, cache):
+        url = "https://example.com"
+        assert cache.put(url, b"x" * 1000, cache.generation(url)) is False
+        assert cache.get(url) is None
+    
+    def test_colliding_url_evicts(self, cache):
+        # With 16 slots, 17 URLs must share at least one slot
+        urls = [f"https://example.com/{i}" for i in range(17)]
+        for url in urls:
+            cache.put(url, url.encode(), cache.generation(url))
+        
+        hits = [cache.get(url) for url in urls]
+        assert all(hit in (None, url.encode()) for hit, url in zip(hits, urls))
+        assert hits.count(None) >= 1
+    
+    def test_disabled_cache_is_a_noop(self):
+        cache = SharedMetadataCache()
+        
+        assert cache.enabled is False
+        assert cache.put("https://example.com", b"x", 0) is False
+        assert cache.get("https://example.com") is None
+        cache.invalidate("https://example.com")
+    
+    def test_shared_between_processes(self, cache, tmp_path):
+        path = str(tmp_path / "cache")
+        context = multiprocessing.get_context("spawn")
+        
+        process = context.Process(target=put_from_other_process, args=(path, "https://example.com", b"from-other"))
+        process.start()
+        process.join()
+        assert process.exitcode == 0
+        assert cache.get("https://example.com") == b"from-other"
+        
+        process = context.Process(target=invalidate_from_other_process, args=(path, "https://example.com"))
+        process.start()
+        process.join()
+        assert process.exitcode == 0
+        assert cache.get("https://example.com") is None
+    
+    def test_reopen_keeps_entries(self, cache, tmp_path):
+        cache.put("https://example.com", b"kept", cache.generation("https://example.com"))
+        
+        other = SharedMetadataCache()
+        other.open(path=str(tmp_path / "cache"), slots=16, slot_size=256)
+        try:
+            assert other.get("https://example.com") == b"kept"
+        finally:
+            other.close()
+    
+    def test_expired_entry_is_a_miss(self, cache):
+        url = "https://example.com"
+        cache.put(url, b"old", cache.generation(url))
+        
+        with patch("app.shared_cache.time.time", return_value=1e12):
+            assert cache.get(url) is None
+        assert cache.get(url) == b"old"
+    
+    def test_ttl_setting(self, cache, monkeypatch):
+        url = "https://example.com"
+        cache.put(url, b"short", cache.generation(url))
+        
+        monkeypatch.setattr(settings, "shared_cache_ttl", 0)
+        assert cache.get(url) is None
+    
+    def test_layout_mismatch_in_use_disables_cache(self, cache, tmp_path):
+        cache.put("https://example.com", b"kept", cache.generation("https://example.com"))
+        
+        other = SharedMetadataCache()
+        other.open(path=str(tmp_path / "cache"), slots=32, slot_size=256)
+        try:
+            assert other.enabled is False
+            assert other.put("https://example.com", b"x", 0) is False
+        finally:
+            other.close()
+        # The file still has the layout the first process mapped
+        assert cache.get("https://example.com") == b"kept"
+    
+    def test_layout_mismatch_unused_reformats(self, cache, tmp_path):
+        cache.put("https://example.com", b"old", cache.generation("https://example.com"))
+        cache.close()
+        
+        other = SharedMetadataCache()
+        other.open(path=str(tmp_path / "cache"), slots=32, slot_size=256)
+        try:
+            assert other.enabled is True
+            assert other.get("https://example.com") is None
+        finally:
+            other.close()
@@ -0,0 +1,78 @@
+import pytest
+from datetime import datetime
+
+from app.repository import MetadataRepository
+from app.streaming import parse_byte_range, page_source_etag, if_range_matches, RangeNotSatisfiable
+
+
+# Tests for Range header parsing.
+class TestParseByteRange:
+    
+    def test_no_header_means_full_body(self):
+        assert parse_byte_range(None, 100) is None
+    
+    def test_explicit_range(self):
+        assert parse_byte_range("bytes=0-9", 100) == (0, 9)
+    
+    def test_open_ended_range(self):
+        assert parse_byte_range("bytes=90-", 100) == (90, 99)
+    
+    def test_end_is_clamped(self):
+        assert parse_byte_range("bytes=50-1000", 100) == (50, 99)
+    
+    def test_suffix_range(self):
+        assert parse_byte_range("bytes=-10", 100) == (90, 99)
+        assert parse_byte_range("bytes=-1000", 100) == (0, 99)
+    
+    def test_unsatisfiable_range(self):
+        with pytest.raises(RangeNotSatisfiable):
+            parse_byte_range("bytes=100-", 100)
+        with pytest.raises(RangeNotSatisfiable):
+            parse_byte_range("bytes=20-10", 100)
+    
+    def test_empty_body_is_unsatisfiable(self):
+        with pytest.raises(RangeNotSatisfiable):
+            parse_byte_range("bytes=-5", 0)
+        with pytest.raises(RangeNotSatisfiable):
+            parse_byte_range("bytes=0-", 0)
+    
+    def test_unsupported_ranges_are_ignored(self):
+        assert parse_byte_range("items=0-9", 100) is None
+        assert parse_byte_range("bytes=0-9,20-29", 100) is None
+        assert parse_byte_range("bytes=abc-", 100) is None
+        assert parse_byte_range("bytes=5", 100) is None
+
+
+# Tests for ETags and If-Range.
+class TestETag:
+    
+    def test_etag_changes_with_version_and_encoding(self):
+        old = page_source_etag({"updated_at": datetime(2024, 1, 1)})
+        new = page_source_etag({"updated_at": datetime(2024, 1, 2)})
+        gzipped = page_source_etag({"updated_at": datetime(2024, 1, 1)}, "gzip")
+        
+        assert old.startswith('"') and old.endswith('"')
+        assert len({old, new, gzipped}) == 3
+        assert page_source_etag({}) is None
+    
+    def test_if_range(self):
+        assert if_range_matches(None, '"a"')
+        assert if_range_matches('"a"', '"a"')
+        assert not if_range_matches('"b"', '"a"')
+        assert not if_range_matches("Wed, 21 Oct 2015 07:28:00 GMT", '"a"')
+        assert not if_range_matches('"a"', None)
+
+
+# Tests for streaming inline page sources.
+@pytest.mark.asyncio
+class TestStreamPageSource:
+    
+    async def test_inline_source_is_chunked(self, monkeypatch):
+        monkeypatch.setattr("app.repository.settings.source_chunk_size", 4)
+        document = {"page_source": "<html>héllo</html>", "page_source_file_id": None}
+        encoded = document["page_source"].encode("utf-8")
+        
+        chunks = [chunk async for chunk in MetadataRepository.stream_page_source(document, 2, 12)]
+        
+        assert all(len(chunk) <= 4 for chunk in chunks)
+        assert b"".join(chunks) == encoded[2:13]
@@ -0,0 +1,147 @@
+import io
+import sys
+import json
+import queue
+import logging
+
+import pytest
+
+from app.structured_logging import (
+    JsonFormatter,
+    RateLimitFilter,
+    NonBlockingQueueHandler,
+    setup_logging,
+    shutdown_logging,
+)
+
+
+def make_record(msg="Stored metadata for %s", args=("https://example.com",), level=logging.INFO, **extra):
+    record = logging.LogRecord("app.repository", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+# Tests for the JSON formatter.
+class TestJsonFormatter:
+    
+    def test_fields_and_extra(self):
+        entry = json.loads(JsonFormatter().format(make_record(url="https://example.com")))
+        
+        assert entry["level"] == "INFO"
+        assert entry["logger"] == "app.repository"
+        assert entry["message"] == "Stored metadata for https://example.com"
+        assert entry["url"] == "https://example.com"
+        assert "args" not in entry
+    
+    def test_exception_is_rendered(self):
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = logging.LogRecord("app", logging.ERROR, __file__, 1, "failed", (), None)
+            record.exc_info = sys.exc_info()
+        
+        entry = json.loads(JsonFormatter().format(record))
+        assert "ValueError: boom" in entry["exception"]
+
+
+# Tests for per-URL rate limiting.
+class TestRateLimitFilter:
+    
+    def test_limits_per_url_messages(self):
+        limiter = RateLimitFilter(burst=3, window=60)
+        passed = [limiter.filter(make_record(url=f"https://{i}.com")) for i in range(10)]
+        assert passed == [True] * 3 + [False] * 7
+    
+    def test_other_messages_pass(self):
+        limiter = RateLimitFilter(burst=1, window=60)
+        assert all(limiter.filter(make_record(msg="Profiling disabled", args=())) for _ in range(5))
+    
+    def test_suppressed_count_reported_after_window(self, monkeypatch):
+        clock = [100.0]
+        monkeypatch.setattr("app.structured_logging.time.monotonic", lambda: clock[0])
+        limiter = RateLimitFilter(burst=1, window=10)
+        
+        assert limiter.filter(make_record(url="a"))
+        assert not limiter.filter(make_record(url="b"))
+        assert not limiter.filter(make_record(url="c"))
+        
+        clock[0] += 10
+        record = make_record(url="d")
+        assert limiter.filter(record)
+        assert record.suppressed == 2
+    
+    def test_templates_are_limited_separately(self):
+        limiter = RateLimitFilter(burst=1, window=60)
+        assert limiter.filter(make_record(url="a"))
+        assert limiter.filter(make_record(msg="Cache miss for %s", url="a"))
+    
+    def test_errors_have_a_larger_budget(self):
+        limiter = RateLimitFilter(burst=1, window=60, warning_burst=5)
+        errors = [limiter.filter(make_record(msg="Error storing metadata for %s", level=logging.ERROR, url=f"https://{i}.com")) for i in range(10)]
+        assert errors == [True] * 5 + [False] * 5
+
+
+# Tests for the queue handler.
+class TestNonBlockingQueueHandler:
+    
+    def test_records_are_not_formatted_on_enqueue(self):
+        handler = NonBlockingQueueHandler(queue.Queue())
+        record = make_record()
+        handler.emit(record)
+        
+        queued = handler.queue.get_nowait()
+        assert queued is record
+        assert queued.args == ("https://example.com",)
+    
+    def test_drops_when_full(self):
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=2))
+        for _ in range(5):
+            handler.emit(make_record())
+        
+        assert handler.queue.qsize() == 2
+        assert handler.dropped == 3
+    
+    def test_dropped_records_are_reported_once_there_is_room(self):
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=2))
+        for _ in range(5):
+            handler.emit(make_record())
+        handler.queue.get_nowait()
+        handler.queue.get_nowait()
+        
+        record = make_record()
+        handler.emit(record)
+        
+        warning = handler.queue.get_nowait()
+        assert warning.levelno == logging.WARNING
+        assert warning.getMessage() == "Dropped 3 log records, the log queue was full"
+        assert warning.dropped == 3
+        assert handler.queue.get_nowait() is record
+        
+        handler.emit(make_record())
+        assert handler.queue.qsize() == 1
+
+
+# Tests for the logging pipeline.
+class TestSetupLogging:
+    
+    @pytest.fixture
+    def output(self):
+        stream = io.StringIO()
+        setup_logging(stream=stream, level="INFO", log_format="json")
+        yield stream
+        setup_logging()
+    
+    def test_writes_json_lines(self, output):
+        logging.getLogger("app.test").info("Collected %s", "https://example.com", extra={"url": "https://example.com"})
+        shutdown_logging()
+        
+        entry = json.loads(output.getvalue().splitlines()[-1])
+        assert entry["message"] == "Collected https://example.com"
+        assert entry["url"] == "https://example.com"
+    
+    def test_uvicorn_loggers_are_routed(self, output):
+        assert logging.getLogger("uvicorn.access").handlers == []
+        logging.getLogger("uvicorn.access").info("GET / 200")
+        shutdown_logging()
+        
+        assert json.loads(output.getvalue().splitlines()[-1])["logger"] == "uvicorn.access"
@@ -0,0 +1,75 @@
+import pytest
+from unittest.mock import patch
+import httpx
+
+from app.collector import MetadataCollector
+from app.timing import FetchTimer, FetchStats
+
+
+# Tests for the per-fetch timing breakdown.
+@pytest.mark.asyncio
+class TestFetchTimer:
+    
+    async def test_trace_events_are_mapped_to_phases(self):
+        timer = FetchTimer()
+        
+        with patch("app.timing.time.perf_counter", side_effect=[1.0, 1.5, 2.0, 2.1, 2.3, 5.0]):
+            await timer.trace("connection.connect_tcp.started", {})
+            await timer.trace("connection.connect_tcp.complete", {})
+            await timer.trace("http11.receive_response_headers.started", {})
+            await timer.trace("http11.receive_response_headers.complete", {})
+            await timer.trace("http11.response_closed.started", {})
+            await timer.trace("http11.receive_response_body.started", {})
+        
+        breakdown = timer.breakdown()
+        assert breakdown["connect"] == 500.0
+        assert breakdown["ttfb"] == 100.0
+        # Body never completed, so it is not counted
+        assert breakdown["download"] == 0.0
+    
+    async def test_redirects_are_summed(self):
+        with patch("app.timing.time.perf_counter", side_effect=[0.0, 0.5, 1.0, 1.2, 2.0, 2.3, 3.0]):
+            timer = FetchTimer()
+            await timer.on_request(None)
+            await timer.trace("connection.connect_tcp.started", {})
+            await timer.trace("connection.connect_tcp.complete", {})
+            await timer.on_request(None)
+            await timer.trace("connection.connect_tcp.started", {})
+            await timer.trace("connection.connect_tcp.complete", {})
+        
+        breakdown = timer.breakdown()
+        assert breakdown["requests"] == 2
+        assert breakdown["setup"] == 500.0
+        assert breakdown["connect"] == pytest.approx(500.0)
+    
+    async def test_collector_stores_timing(self):
+        with patch("httpx.AsyncClient.get", side_effect=httpx.ConnectError("Connection failed")):
+            metadata, _ = await MetadataCollector.collect_metadata("https://timing-test.com")
+        
+        assert metadata["timing"]["total"] >= 0
+        assert set(metadata["timing"]) >= {"connect", "tls", "send", "ttfb", "download", "total"}
+
+
+# Tests for the aggregate fetch stats.
+class TestFetchStats:
+    
+    def test_summary(self):
+        stats = FetchStats(window=100)
+        for total in range(1, 101):
+            stats.record({"total": float(total), "connect": 1.0}, failed=total % 10 == 0)
+        
+        summary = stats.summary()
+        assert summary["fetches"] == 100
+        assert summary["failures"] == 10
+        assert summary["phases"]["total"]["p50_ms"] == 51.0
+        assert summary["phases"]["total"]["p95_ms"] == 96.0
+        assert summary["phases"]["total"]["max_ms"] == 100.0
+        assert summary["phases"]["connect"]["mean_ms"] == 1.0
+    
+    def test_window_is_bounded(self):
+        stats = FetchStats(window=10)
+        for total in range(100):
+            stats.record({"total": float(total)})
+        
+        assert stats.summary()["phases"]["total"]["max_ms"] == 99.0
+        assert len(stats._samples["total"]) == 10
@@ -0,0 +1,166 @@
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.config import settings
+from app.models import MetadataStatus
+from app.notifier import notifier
+from app.shared_cache import shared_cache
+from app.warmup import AccessTracker, CacheWarmer
+
+
+def make_document(url, status="completed", age=0):
+    return {
+        "url": url,
+        "headers": {},
+        "cookies": {},
+        "page_source": "<html></html>",
+        "status": status,
+        "created_at": datetime.utcnow() - timedelta(seconds=age),
+        "updated_at": datetime.utcnow() - timedelta(seconds=age),
+        "response_encodings": {"gzip": b"gzipped"}
+    }
+
+
+@pytest.fixture
+def cache(tmp_path):
+    shared_cache.open(path=str(tmp_path / "cache"), slots=16, slot_size=4096)
+    yield shared_cache
+    shared_cache.close()
+
+
+# Tests for batched access counting.
+@pytest.mark.asyncio
+class TestAccessTracker:
+    
+    async def test_flush_writes_counts_in_one_batch(self):
+        tracker = AccessTracker()
+        for url in ["https://a.com", "https://b.com", "https://a.com"]:
+            tracker.record(url)
+        
+        with patch("app.warmup.MetadataRepository.increment_access_counts", AsyncMock(return_value=True)) as increment:
+            assert await tracker.flush() == 2
+            assert await tracker.flush() == 0
+        
+        increment.assert_awaited_once_with({"https://a.com": 2, "https://b.com": 1})
+
+
+# Tests for the cache warmer.
+@pytest.mark.asyncio
+class TestCacheWarmer:
+    
+    async def test_needs_collection(self):
+        warmer = CacheWarmer()
+        assert warmer.needs_collection(None)
+        assert warmer.needs_collection(make_document("https://a.com", status=MetadataStatus.PENDING))
+        assert warmer.needs_collection(make_document("https://a.com", age=settings.warmup_max_age + 60))
+        assert not warmer.needs_collection(make_document("https://a.com"))
+        assert not warmer.needs_collection(make_document("https://a.com", status="failed"))
+    
+    async def test_fresh_records_are_loaded_into_the_cache(self, cache):
+        url = "https://fresh.com"
+        warmer = CacheWarmer()
+        with patch("app.warmup.MetadataRepository.get_by_url", AsyncMock(return_value=make_document(url))), \
+             patch("app.warmup.MetadataCollector.collect_metadata", AsyncMock()) as collect:
+            await warmer.warm_url(url)
+        
+        collect.assert_not_awaited()
+        assert warmer.progress["loaded"] == 1
+        assert warmer.progress["cached"] == 1
+        assert b'"url":"https://fresh.com"' in cache.get(url)
+        assert cache.get(url, "gzip") == b"gzipped"
+    
+    async def test_missing_records_are_collected(self, cache):
+        url = "https://missing.com"
+        warmer = CacheWarmer()
+        get_by_url = AsyncMock(side_effect=[None, make_document(url)])
+        with patch("app.warmup.MetadataRepository.get_by_url", get_by_url), \
+             patch("app.warmup.MetadataCollector.collect_metadata", AsyncMock(return_value=({"url": url}, "completed"))), \
+             patch("app.warmup.MetadataRepository.create_or_update", AsyncMock(return_value=True)) as store:
+            await warmer.warm_url(url)
+        
+        store.assert_awaited_once()
+        assert warmer.progress["collected"] == 1
+        assert cache.get(url) is not None
+        assert not notifier.is_in_flight(url)
+    
+    async def test_in_flight_collections_are_skipped(self):
+        url = "https://in-flight.com"
+        warmer = CacheWarmer()
+        notifier.start(url)
+        try:
+            with patch("app.warmup.MetadataRepository.get_by_url", AsyncMock(return_value=None)), \
+                 patch("app.warmup.MetadataCollector.collect_metadata", AsyncMock()) as collect:
+                await warmer.warm_url(url)
+        finally:
+            notifier.finish(url)
+        
+        collect.assert_not_awaited()
+        assert warmer.progress["skipped"] == 1
+    
+    async def test_run_reports_progress(self):
+        warmer = CacheWarmer()
+        urls = [f"https://site-{i}.com" for i in range(5)] + ["not a url", "https://site-0.com"]
+        with patch("app.warmup.MetadataRepository.get_by_url", AsyncMock(side_effect=lambda url, **kwargs: make_document(url))):
+            assert warmer.start(urls=urls, concurrency=2)
+            assert warmer.start(urls=urls) is False
+            await warmer._task
+        
+        status = warmer.status()
+        assert status["state"] == "done"
+        assert status["source"] == "request"
+        assert status["total"] == 5
+        assert status["processed"] == 5
+        assert status["loaded"] == 5
+        assert status["percent"] == 100.0
+    
+    async def test_ranks_by_access_count_without_seeds(self, monkeypatch):
+        monkeypatch.setattr(settings, "warmup_seed_file", None)
+        warmer = CacheWarmer()
+        with patch("app.warmup.MetadataRepository.get_most_accessed", AsyncMock(return_value=["https://hot.com"])) as ranked:
+            assert await warmer.select_urls(None, 3) == ["https://hot.com"]
+        
+        ranked.assert_awaited_once_with(3)
+        assert warmer.progress["source"] == "access_count"
+    
+    async def test_seed_file(self, monkeypatch, tmp_path):
+        seed_file = tmp_path / "seeds.txt"
+        seed_file.write_text('https://one.com\n{"url": "https://two.com"}\nhttps://three.com\n')
+        monkeypatch.setattr(settings, "warmup_seed_file", str(seed_file))
+        
+        warmer = CacheWarmer()
+        assert await warmer.select_urls(None, 2) == ["https://one.com", "https://two.com"]
+        assert warmer.progress["source"] == "seed_file"
+    
+    async def test_readiness_waits_for_threshold(self, monkeypatch):
+        monkeypatch.setattr(settings, "warmup_ready_threshold", 0.5)
+        warmer = CacheWarmer()
+        release = asyncio.Event()
+        
+        async def slow_get_by_url(url, **kwargs):
+            if url.endswith("3.com"):
+                await release.wait()
+            return make_document(url)
+        
+        urls = [f"https://site-{i}.com" for i in range(4)]
+        with patch("app.warmup.MetadataRepository.get_by_url", side_effect=slow_get_by_url):
+            warmer.start(urls=urls, concurrency=1, gate_readiness=True)
+            assert warmer.is_warm() is False
+            
+            while warmer.progress["processed"] < 3:
+                await asyncio.sleep(0.01)
+            assert warmer.is_warm() is True
+            
+            release.set()
+            await warmer._task
+        assert warmer.is_warm() is True
+    
+    async def test_admin_warmup_does_not_gate_readiness(self, monkeypatch):
+        monkeypatch.setattr(settings, "warmup_ready_threshold", 1.0)
+        warmer = CacheWarmer()
+        with patch("app.warmup.MetadataRepository.get_by_url", AsyncMock(side_effect=lambda url, **kwargs: make_document(url))):
+            warmer.start(urls=["https://a.com"])
+            assert warmer.is_warm() is True
+            await warmer._task